@@ -0,0 +1,66 @@
+"""
+Acciones masivas de supervisor sobre clientes.
+
+Cada acción es un único ``UPDATE`` sobre el queryset (selección o filtro)
+dentro de una transacción. ``update()`` no envía señales, así que aquí se
+invalidan a mano la versión de los datos, las estadísticas y las listas
+de los agentes afectados, y se registran las reasignaciones.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .cambios import registrar_reasignaciones
+from .estadisticas import invalidar_estadisticas
+from .fragmentos import TODOS, invalidar_lista
+from .versiones import marcar_cambio
+
+
+REASIGNAR = 'reasignar'
+ACTIVAR = 'activar'
+DESACTIVAR = 'desactivar'
+TIPO_ENTIDAD = 'tipo_entidad'
+
+ACCIONES = [
+    (REASIGNAR, _("Reasignar agente")),
+    (ACTIVAR, _("Activar")),
+    (DESACTIVAR, _("Desactivar")),
+    (TIPO_ENTIDAD, _("Cambiar tipo de entidad")),
+]
+
+
+def cambios_accion(accion, agente=None, tipo_entidad=None):
+    """Columnas que escribe ``accion``."""
+    if accion == REASIGNAR:
+        return {'agente': agente}
+    if accion == ACTIVAR:
+        return {'activo': True}
+    if accion == DESACTIVAR:
+        return {'activo': False}
+    if accion == TIPO_ENTIDAD:
+        return {'tipo_entidad': tipo_entidad}
+    raise ValueError(f'Acción desconocida: {accion}')
+
+
+def aplicar(clientes, accion, agente=None, tipo_entidad=None):
+    """Aplica ``accion`` a todos los clientes del queryset y devuelve cuántos cambió."""
+    cambios = cambios_accion(accion, agente=agente, tipo_entidad=tipo_entidad)
+    # Sin orden ni prefetch: el UPDATE usa el filtro como subconsulta. Las
+    # filas que ya tienen el valor no se reescriben ni se cuentan.
+    clientes = clientes.order_by().exclude(**cambios)
+    with transaction.atomic():
+        # Listas a invalidar: las de los agentes que tenían estos clientes
+        agentes = set(clientes.values_list('agente_id', flat=True).distinct())
+        if 'agente' in cambios:
+            # Salen del alcance de su agente anterior (sincronización incremental)
+            registrar_reasignaciones(clientes.exclude(agente=None).values_list('pk', 'agente_id'))
+        # update() no aplica auto_now: la marca se escribe explícitamente
+        actualizados = clientes.update(**cambios, modificado=timezone.now())
+        if actualizados:
+            marcar_cambio()
+    if actualizados:
+        if cambios.get('agente') is not None:
+            agentes.add(cambios['agente'].pk)
+        invalidar_lista(TODOS, *agentes)
+        invalidar_estadisticas()
+    return actualizados
@@ -1,8 +1,141 @@
-from django.contrib import admin
-from .models import Direccion, Cliente, AgenteVentas, TipoEntidad
-
-# Tus modelos propios
-admin.site.register(Direccion)
-admin.site.register(Cliente)
-admin.site.register(AgenteVentas)
-admin.site.register(TipoEntidad)
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+
+from . import acciones
+from .busqueda import filtro_busqueda
+from .models import Direccion, Cliente, AgenteVentas, TipoDireccion, TipoEntidad
+from .normalizacion import filtro_prefijo, normalizar_rut, normalizar_texto
+from .paginacion import PaginadorEstimado
+from .widgets import SelectAutocompletar
+
+
+class AccionClienteForm(ActionForm):
+    """Campos extra de la barra de acciones para reasignar agente y tipo de entidad."""
+    agente = forms.ModelChoiceField(queryset=AgenteVentas.objects.all(), required=False, label=_("Agente"),
+                                    widget=SelectAutocompletar('agentes'))
+    tipo_entidad = forms.ModelChoiceField(queryset=TipoEntidad.objects.all(), required=False,
+                                          label=_("Tipo de Entidad"))
+
+
+def _accion_masiva(accion, campo=None, descripcion=None):
+    """Acción de admin que aplica ``accion`` a la selección con un solo UPDATE."""
+    def ejecutar(modeladmin, request, queryset):
+        valores = {}
+        if campo:
+            # Solo se valida el campo que usa la acción: 'action' no trae choices aquí
+            field = modeladmin.action_form.base_fields[campo]
+            try:
+                valor = field.clean(request.POST.get(campo))
+            except ValidationError:
+                valor = None
+            if valor is None:
+                modeladmin.message_user(request, _("Debes elegir %(campo)s.") % {'campo': field.label},
+                                        messages.ERROR)
+                return
+            valores[campo] = valor
+        total = acciones.aplicar(queryset, accion, **valores)
+        modeladmin.message_user(request, _("%(total)d clientes actualizados.") % {'total': total},
+                                messages.SUCCESS)
+    ejecutar.__name__ = f'accion_{accion}'
+    return admin.action(description=descripcion, permissions=['change'])(ejecutar)
+
+
+class AdminEscalable(admin.ModelAdmin):
+    """Sin COUNT(*) exactos sobre tablas grandes (ver PaginadorEstimado)."""
+    paginator = PaginadorEstimado
+    # Evita el segundo COUNT(*) de "N de M seleccionados"
+    show_full_result_count = False
+    # Orden por la clave primaria: sin ordenar toda la tabla por otra columna
+    ordering = ['-pk']
+
+
+class BusquedaClientesMixin:
+    """
+    Búsqueda del admin sobre el índice de texto completo de clientes
+    (busqueda.py) en vez de ``icontains`` sobre cada campo de ``search_fields``.
+    """
+    campo_cliente = 'pk'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        filtro = filtro_busqueda(search_term)
+        if filtro is None:
+            return queryset.none(), False
+        clientes = Cliente.objects.filter(filtro).values('pk')
+        return queryset.filter(**{f'{self.campo_cliente}__in': clientes}), False
+
+
+class DireccionInline(admin.TabularInline):
+    model = Direccion
+    extra = 0
+    autocomplete_fields = ['tipo']
+    fields = ['tipo', 'calle', 'numero', 'comuna', 'ciudad', 'codigo_postal', 'pais', 'observacion']
+
+    def get_queryset(self, request):
+        # __str__ de cada dirección (título de la fila) lee el tipo
+        return super().get_queryset(request).select_related('tipo')
+
+
+@admin.register(Cliente)
+class ClienteAdmin(BusquedaClientesMixin, AdminEscalable):
+    list_display = ['nombre_razon_social', 'rut', 'email', 'tipo_entidad', 'agente', 'activo', 'modificado']
+    list_select_related = ['tipo_entidad', 'agente']
+    list_filter = ['activo', 'tipo_entidad']
+    # Requerido por el autocompletado de otros admins; la búsqueda real va por el índice
+    search_fields = ['nombre_razon_social', 'rut', 'email']
+    autocomplete_fields = ['agente', 'tipo_entidad']
+    readonly_fields = ['creado', 'modificado']
+    inlines = [DireccionInline]
+    action_form = AccionClienteForm
+    actions = [
+        _accion_masiva(acciones.REASIGNAR, 'agente', _("Reasignar al agente elegido")),
+        _accion_masiva(acciones.ACTIVAR, descripcion=_("Activar")),
+        _accion_masiva(acciones.DESACTIVAR, descripcion=_("Desactivar")),
+        _accion_masiva(acciones.TIPO_ENTIDAD, 'tipo_entidad', _("Cambiar al tipo de entidad elegido")),
+    ]
+
+
+@admin.register(Direccion)
+class DireccionAdmin(BusquedaClientesMixin, AdminEscalable):
+    campo_cliente = 'cliente_id'
+    list_display = ['calle', 'numero', 'comuna', 'ciudad', 'tipo', 'cliente']
+    list_select_related = ['tipo', 'cliente']
+    search_fields = ['cliente__nombre_razon_social']
+    autocomplete_fields = ['cliente', 'tipo']
+    readonly_fields = ['creado', 'modificado']
+
+
+@admin.register(AgenteVentas)
+class AgenteVentasAdmin(AdminEscalable):
+    list_display = ['nombre', 'rut', 'email', 'telefono', 'user']
+    list_select_related = ['user']
+    search_fields = ['nombre', 'rut', 'email']
+    autocomplete_fields = ['user']
+    ordering = ['nombre']
+
+    def get_search_results(self, request, queryset, search_term):
+        # RUT y correo por sus índices únicos; el nombre como prefijo
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        canonico = normalizar_rut(termino)
+        if canonico:
+            return queryset.filter(rut_normalizado=canonico), False
+        if '@' in termino:
+            return queryset.filter(email=termino), False
+        return queryset.filter(filtro_prefijo('nombre_normalizado', normalizar_texto(termino))), False
+
+
+@admin.register(TipoEntidad)
+class TipoEntidadAdmin(admin.ModelAdmin):
+    search_fields = ['nombre']
+
+
+@admin.register(TipoDireccion)
+class TipoDireccionAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'descripcion']
+    search_fields = ['nombre']
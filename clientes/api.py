@@ -0,0 +1,244 @@
+"""
+API JSON de solo lectura para los sistemas que sincronizan clientes.
+
+    GET /api/clientes/         página de clientes (?despues= / ?antes= / ?por_pagina=)
+    GET /api/clientes/<id>/    un cliente
+    GET /api/cambios/?desde=   clientes cambiados y borrados desde una marca (ver cambios.py)
+
+``?fields=id,rut,direcciones.comuna`` limita los campos entregados; sin
+``fields`` van todos, con ``direcciones`` anidadas. Las filas se leen con
+``values()`` (sin instanciar modelos) y las direcciones de toda la página en
+una sola consulta. El alcance es el mismo de ``lista_clientes``: los
+supervisores ven todo y los agentes solo sus clientes. Se autentica con la
+sesión del sitio o con HTTP Basic.
+"""
+import base64
+import binascii
+import hashlib
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from .cambios import clientes_cambiados, eliminados, formatear_marca, ventana
+from .middleware import PerfilUsuario
+from .models import Direccion
+from .paginacion import paginar_keyset
+from .versiones import etag_por_usuario, ultima_modificacion
+
+
+# Nombre en la API -> expresión para values()
+CAMPOS_CLIENTE = {
+    'id': 'id',
+    'tipo_entidad': 'tipo_entidad__nombre',
+    'nombre_razon_social': 'nombre_razon_social',
+    'rut': 'rut',
+    'email': 'email',
+    'telefono': 'telefono',
+    'sitio_web': 'sitio_web',
+    'activo': 'activo',
+    'observacion': 'observacion',
+    'agente_id': 'agente_id',
+    'agente': 'agente__nombre',
+    'creado': 'creado',
+    'modificado': 'modificado',
+}
+CAMPOS_DIRECCION = {
+    'id': 'id',
+    'tipo': 'tipo__nombre',
+    'calle': 'calle',
+    'numero': 'numero',
+    'comuna': 'comuna',
+    'ciudad': 'ciudad',
+    'codigo_postal': 'codigo_postal',
+    'pais': 'pais',
+    'observacion': 'observacion',
+    'creado': 'creado',
+    'modificado': 'modificado',
+}
+
+# Segundos que se recuerda una credencial Basic válida (evita el hash de la
+# contraseña en cada página de una sincronización)
+BASIC_CACHE_TTL = getattr(settings, 'API_BASIC_CACHE_TTL', 300)
+
+
+def _error(mensaje, status, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=status)
+
+
+def _usuario_basic(request):
+    cabecera = request.META.get('HTTP_AUTHORIZATION', '')
+    if not cabecera.startswith('Basic '):
+        return None
+    clave = 'clientes:api:basic:' + hashlib.sha256(cabecera.encode('utf-8')).hexdigest()
+    recordado = cache.get(clave)
+    if recordado is not None:
+        user_id, hash_sesion = recordado
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+        # Como las sesiones: un cambio de contraseña invalida la credencial recordada
+        if user is not None and constant_time_compare(user.get_session_auth_hash(), hash_sesion):
+            return user
+        cache.delete(clave)
+        return None
+    try:
+        usuario, _, password = base64.b64decode(cabecera[6:]).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    user = authenticate(request, username=usuario, password=password)
+    if user is not None:
+        cache.set(clave, (user.pk, user.get_session_auth_hash()), BASIC_CACHE_TTL)
+    return user
+
+
+def api_autenticada(vista):
+    """Como ``login_required``, pero responde 401 en JSON y acepta HTTP Basic."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            user = _usuario_basic(request)
+            if user is None:
+                respuesta = _error('No autenticado', 401)
+                respuesta['WWW-Authenticate'] = 'Basic realm="gestion_clientes"'
+                return respuesta
+            request.user = user
+            request.perfil = PerfilUsuario(user)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def campos_pedidos(params):
+    """
+    Interpreta ``?fields=``. Devuelve ``(campos_cliente, campos_direccion,
+    desconocidos)``; ``campos_direccion`` es ``None`` si no se pidieron
+    direcciones.
+    """
+    valor = params.get('fields', '').strip()
+    if not valor:
+        return list(CAMPOS_CLIENTE), list(CAMPOS_DIRECCION), []
+
+    cliente, direccion, desconocidos = [], None, []
+    for campo in filter(None, (c.strip() for c in valor.split(','))):
+        if campo == 'direcciones':
+            direccion = list(CAMPOS_DIRECCION)
+        elif campo.startswith('direcciones.') and campo[12:] in CAMPOS_DIRECCION:
+            direccion = direccion or []
+            if campo[12:] not in direccion:
+                direccion.append(campo[12:])
+        elif campo in CAMPOS_CLIENTE:
+            if campo not in cliente:
+                cliente.append(campo)
+        else:
+            desconocidos.append(campo)
+    return cliente, direccion, desconocidos
+
+
+def _consulta(queryset, campos):
+    # 'id' siempre se lee: lo necesitan el cursor y las direcciones
+    return queryset.values('id', *{CAMPOS_CLIENTE[c] for c in campos} - {'id'})
+
+
+def serializar(filas, campos, campos_direccion):
+    """Convierte filas de ``values()`` a la forma de la API, con sus direcciones."""
+    resultado = [{campo: fila[CAMPOS_CLIENTE[campo]] for campo in campos} for fila in filas]
+    if campos_direccion is None:
+        return resultado
+
+    por_cliente = defaultdict(list)
+    expresiones = {CAMPOS_DIRECCION[c] for c in campos_direccion}
+    direcciones = (
+        Direccion.objects
+        .filter(cliente_id__in=[fila['id'] for fila in filas])
+        .order_by('cliente_id', 'pk')
+        .values('cliente_id', *expresiones)
+    )
+    for direccion in direcciones:
+        por_cliente[direccion['cliente_id']].append(
+            {campo: direccion[CAMPOS_DIRECCION[campo]] for campo in campos_direccion}
+        )
+    for fila, datos in zip(filas, resultado):
+        datos['direcciones'] = por_cliente[fila['id']]
+    return resultado
+
+
+def _json(datos, **kwargs):
+    return JsonResponse(datos, json_dumps_params={'ensure_ascii': False}, **kwargs)
+
+
+@require_GET
+@api_autenticada
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_usuario, last_modified_func=ultima_modificacion)
+def clientes(request):
+    campos, campos_direccion, desconocidos = campos_pedidos(request.GET)
+    if desconocidos:
+        return _error('Campos desconocidos', 400, campos=desconocidos)
+
+    pagina = paginar_keyset(_consulta(request.perfil.clientes_visibles(), campos), request.GET)
+
+    def enlace(query):
+        return request.build_absolute_uri(f'{request.path}?{query}') if query else None
+
+    return _json({
+        'resultados': serializar(pagina.objetos, campos, campos_direccion),
+        'siguiente': enlace(pagina.query_siguiente),
+        'anterior': enlace(pagina.query_anterior),
+    })
+
+
+@require_GET
+@api_autenticada
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_usuario, last_modified_func=ultima_modificacion)
+def cliente(request, pk):
+    campos, campos_direccion, desconocidos = campos_pedidos(request.GET)
+    if desconocidos:
+        return _error('Campos desconocidos', 400, campos=desconocidos)
+
+    filas = list(_consulta(request.perfil.clientes_visibles().filter(pk=pk), campos))
+    if not filas:
+        return _error('No encontrado', 404)
+    return _json(serializar(filas, campos, campos_direccion)[0])
+
+
+@require_GET
+@api_autenticada
+@cache_control(private=True, no_cache=True)
+def cambios(request):
+    """
+    Clientes (con todas sus direcciones) cambiados en ``[desde, hasta)`` y,
+    en la primera página, los ids eliminados. La siguiente sincronización
+    usa como ``desde`` el ``hasta`` de la respuesta.
+    """
+    campos, campos_direccion, desconocidos = campos_pedidos(request.GET)
+    if desconocidos:
+        return _error('Campos desconocidos', 400, campos=desconocidos)
+    try:
+        desde, hasta = ventana(request.GET)
+    except ValueError:
+        return _error('Marca inválida: use ?desde= en formato ISO 8601', 400)
+
+    # 'hasta' queda fijo en los enlaces para que todas las páginas usen la misma ventana
+    params = request.GET.copy()
+    params['hasta'] = formatear_marca(hasta)
+    clientes = clientes_cambiados(request.perfil.clientes_visibles(), desde, hasta)
+    pagina = paginar_keyset(_consulta(clientes, campos), params)
+
+    def enlace(query):
+        return request.build_absolute_uri(f'{request.path}?{query}') if query else None
+
+    datos = {
+        'desde': formatear_marca(desde),
+        'hasta': params['hasta'],
+        'resultados': serializar(pagina.objetos, campos, campos_direccion),
+        'siguiente': enlace(pagina.query_siguiente),
+        'anterior': enlace(pagina.query_anterior),
+    }
+    if not request.GET.get('despues') and not request.GET.get('antes'):
+        datos['eliminados'] = eliminados(request.perfil, desde, hasta)
+    return _json(datos)
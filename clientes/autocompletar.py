@@ -0,0 +1,105 @@
+"""
+Endpoints JSON de los selects con autocompletado (``widgets.SelectAutocompletar``).
+
+    GET /autocompletar/<fuente>/?q=<texto>&pagina=<n>
+    -> {"resultados": [{"id": 1, "texto": "..."}], "mas": true}
+
+Cada página trae ``POR_PAGINA`` opciones en vez de la tabla completa. Las
+respuestas quedan en caché por fuente, texto y página; un cambio en el
+modelo de la fuente (señales) cambia su generación y deja obsoletas todas
+sus entradas.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import AgenteVentas, TipoDireccion, TipoEntidad
+from .normalizacion import filtro_prefijo, normalizar_rut, normalizar_texto
+
+
+POR_PAGINA = 20
+CACHE_TTL = getattr(settings, 'AUTOCOMPLETAR_CACHE_TTL', 300)
+
+
+def _filtro_agentes(texto):
+    canonico = normalizar_rut(texto)
+    if canonico:
+        return Q(rut_normalizado=canonico)
+    return filtro_prefijo('nombre_normalizado', normalizar_texto(texto))
+
+
+def _filtro_nombre(texto):
+    # Tablas de catálogo pequeñas: basta un prefijo sin distinguir mayúsculas
+    return Q(nombre__istartswith=texto)
+
+
+# fuente -> (modelo, filtro del texto, orden)
+FUENTES = {
+    'agentes': (AgenteVentas, _filtro_agentes, ('nombre_normalizado', 'pk')),
+    'tipos-entidad': (TipoEntidad, _filtro_nombre, ('nombre', 'pk')),
+    'tipos-direccion': (TipoDireccion, _filtro_nombre, ('nombre', 'pk')),
+}
+FUENTE_POR_MODELO = {modelo: fuente for fuente, (modelo, _, _) in FUENTES.items()}
+
+
+def _clave_generacion(fuente):
+    return f'clientes:autocompletar:generacion:{fuente}'
+
+
+def generacion(fuente):
+    clave = _clave_generacion(fuente)
+    valor = cache.get(clave)
+    if valor is None:
+        valor = time.time_ns()
+        cache.add(clave, valor, None)
+        valor = cache.get(clave, valor)
+    return valor
+
+
+def invalidar(modelo):
+    fuente = FUENTE_POR_MODELO.get(modelo)
+    if fuente is not None:
+        # Al confirmar, como invalidar_lista (clientes/fragmentos.py)
+        transaction.on_commit(lambda: cache.set(_clave_generacion(fuente), time.time_ns(), None))
+
+
+def opciones(fuente, texto, pagina):
+    """Página ``pagina`` (desde 1) de opciones de ``fuente`` que calzan con ``texto``."""
+    modelo, filtro, orden = FUENTES[fuente]
+    consulta = modelo.objects.order_by(*orden)
+    if texto:
+        consulta = consulta.filter(filtro(texto))
+    inicio = (pagina - 1) * POR_PAGINA
+    filas = list(consulta.values_list('pk', 'nombre')[inicio:inicio + POR_PAGINA + 1])
+    return {
+        'resultados': [{'id': pk, 'texto': nombre} for pk, nombre in filas[:POR_PAGINA]],
+        'mas': len(filas) > POR_PAGINA,
+    }
+
+
+@login_required
+@require_GET
+def autocompletar(request, fuente):
+    if fuente not in FUENTES:
+        raise Http404
+    texto = request.GET.get('q', '').strip()[:100]
+    try:
+        pagina = max(1, int(request.GET.get('pagina', 1)))
+    except ValueError:
+        pagina = 1
+
+    clave = 'clientes:autocompletar:%s:%s:%d:%s' % (
+        fuente, generacion(fuente), pagina, hashlib.sha1(texto.lower().encode('utf-8')).hexdigest(),
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        datos = opciones(fuente, texto, pagina)
+        cache.set(clave, datos, CACHE_TTL)
+    return JsonResponse(datos, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,268 @@
+"""
+Búsqueda de texto completo sobre clientes y sus direcciones.
+
+Cada cliente es un documento con nombre, RUT, correo, observación y el
+texto de todas sus direcciones, normalizado con ``normalizar_texto`` (sin
+tildes ni mayúsculas) tanto al indexar como al buscar.
+
+- En SQLite el índice es la tabla virtual FTS5 ``clientes_busqueda``
+  (``rowid`` = id del cliente) y el orden lo da ``bm25`` con más peso para
+  el nombre y el RUT.
+- En otros motores se usa ``TerminoBusqueda``, un índice invertido común:
+  cada palabra se busca como prefijo por rango sobre una columna con
+  índice B-tree (``filtro_prefijo``), sin ``LIKE``, y el orden es la suma de
+  los pesos de los campos donde aparece.
+
+El índice se mantiene con señales (save/delete de ``Cliente`` y
+``Direccion``); las escrituras masivas llaman a ``indexar`` y
+``manage.py reconstruir_busqueda`` lo rehace completo.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, Max, Q, Sum, When
+from django.db.models.expressions import RawSQL
+
+from .normalizacion import filtro_prefijo, normalizar_rut, normalizar_texto
+
+
+TABLA_FTS = 'clientes_busqueda'
+# Columnas del documento y su peso en el orden de los resultados
+PESOS = {
+    'nombre': 10,
+    'rut': 8,
+    'email': 5,
+    'observacion': 1,
+    'direcciones': 2,
+}
+# Resultados que se muestran ordenados por relevancia
+LIMITE = getattr(settings, 'BUSQUEDA_LIMITE', 100)
+# Clientes por cada escritura al índice
+TAMANO_LOTE = 500
+
+_PALABRAS = re.compile(r'[^\W_]+')
+_FORMA_RUT = re.compile(r'^[0-9][0-9.]*-?[0-9kK]$')
+_LARGO_TERMINO = 100
+_fts5 = {}
+
+
+def usa_fts5():
+    """``True`` si la base actual tiene la tabla FTS5 (SQLite con FTS5 disponible)."""
+    clave = (connection.alias, str(connection.settings_dict['NAME']))
+    if clave not in _fts5:
+        _fts5[clave] = connection.vendor == 'sqlite' and TABLA_FTS in connection.introspection.table_names()
+    return _fts5[clave]
+
+
+def crear_tabla_fts(schema_editor):
+    """Crea la tabla FTS5; devuelve ``False`` si el motor no es SQLite o no trae FTS5."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    columnas = ', '.join(PESOS)
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5({columnas}, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except DatabaseError:
+        # SQLite compilado sin FTS5: queda el índice de TerminoBusqueda
+        return False
+    _fts5.clear()
+    return True
+
+
+def terminos(texto):
+    """
+    Palabras normalizadas de ``texto``. Lo que tiene forma de RUT queda
+    como una sola palabra sin puntos ni guion, para que "12.345.678-5",
+    "12345678-5" y "12345678" (como prefijo) calcen entre sí.
+    """
+    palabras = []
+    for parte in str(texto or '').split():
+        if _FORMA_RUT.match(parte):
+            rut = normalizar_rut(parte) or parte
+            palabras.append(rut.replace('.', '').replace('-', '').lower())
+        else:
+            palabras.extend(_PALABRAS.findall(normalizar_texto(parte)))
+    return palabras
+
+
+#====================================
+# Indexación
+#====================================
+def documentos(ids, Cliente, Direccion):
+    """``{id: {columna: texto}}`` de los clientes ``ids`` que existen."""
+    docs = {}
+    for fila in Cliente.objects.filter(pk__in=ids).values('pk', 'nombre_razon_social', 'rut',
+                                                           'rut_normalizado', 'email', 'observacion'):
+        rut = ' '.join(filter(None, [(fila['rut_normalizado'] or '').replace('-', ''), fila['rut']]))
+        docs[fila['pk']] = {
+            'nombre': fila['nombre_razon_social'],
+            'rut': rut,
+            'email': fila['email'],
+            'observacion': fila['observacion'],
+            'direcciones': [],
+        }
+    direcciones = (
+        Direccion.objects.filter(cliente_id__in=list(docs))
+        .order_by('cliente_id', 'pk')
+        .values_list('cliente_id', 'calle', 'numero', 'comuna', 'ciudad', 'codigo_postal', 'pais', 'observacion')
+    )
+    for cliente_id, *partes in direcciones:
+        docs[cliente_id]['direcciones'].append(' '.join(filter(None, partes)))
+    for doc in docs.values():
+        doc['direcciones'] = ' | '.join(doc['direcciones'])
+        for columna, texto in doc.items():
+            doc[columna] = ' '.join(terminos(texto))
+    return docs
+
+
+def _escribir_fts(cursor, ids, docs):
+    marcadores = ', '.join(['%s'] * len(ids))
+    cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcadores})', list(ids))
+    if docs:
+        columnas = ', '.join(PESOS)
+        valores = ', '.join(['%s'] * (len(PESOS) + 1))
+        cursor.executemany(
+            f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) VALUES ({valores})',
+            [[pk] + [doc[c] for c in PESOS] for pk, doc in docs.items()],
+        )
+
+
+def _escribir_terminos(TerminoBusqueda, ids, docs):
+    TerminoBusqueda.objects.filter(cliente_id__in=ids).delete()
+    nuevos = []
+    for pk, doc in docs.items():
+        pares = {}
+        for columna, texto in doc.items():
+            for termino in texto.split():
+                termino = termino[:_LARGO_TERMINO]
+                pares[termino] = max(pares.get(termino, 0), PESOS[columna])
+        nuevos.extend(TerminoBusqueda(cliente_id=pk, termino=t, peso=p) for t, p in pares.items())
+    TerminoBusqueda.objects.bulk_create(nuevos, batch_size=2000)
+
+
+def indexar(ids, modelos=None):
+    """
+    Reescribe en el índice los clientes ``ids``; los que ya no existen se
+    quitan. ``modelos`` = ``(Cliente, Direccion, TerminoBusqueda)`` permite
+    usarlo desde migraciones.
+    """
+    if modelos is None:
+        from .models import Cliente, Direccion, TerminoBusqueda
+        modelos = (Cliente, Direccion, TerminoBusqueda)
+    Cliente, Direccion, TerminoBusqueda = modelos
+    ids = list(ids)
+    fts5 = usa_fts5()
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        lote = ids[inicio:inicio + TAMANO_LOTE]
+        docs = documentos(lote, Cliente, Direccion)
+        if fts5:
+            with connection.cursor() as cursor:
+                _escribir_fts(cursor, lote, docs)
+        else:
+            _escribir_terminos(TerminoBusqueda, lote, docs)
+
+
+def quitar(ids):
+    """Saca del índice FTS5 los clientes eliminados (``TerminoBusqueda`` se borra en cascada)."""
+    if ids and usa_fts5():
+        with connection.cursor() as cursor:
+            _escribir_fts(cursor, list(ids), {})
+
+
+def reconstruir(modelos=None, vaciar=True):
+    """Indexa todos los clientes por lotes de id. Devuelve cuántos se indexaron."""
+    if modelos is None:
+        from .models import Cliente, Direccion, TerminoBusqueda
+        modelos = (Cliente, Direccion, TerminoBusqueda)
+    Cliente, _, TerminoBusqueda = modelos
+    fts5 = usa_fts5()
+    if vaciar:
+        if fts5:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        else:
+            TerminoBusqueda.objects.all().delete()
+
+    total, ultimo = 0, 0
+    while True:
+        lote = list(
+            Cliente.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        indexar(lote, modelos)
+        total += len(lote)
+        ultimo = lote[-1]
+
+    if fts5:
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}) VALUES ('optimize')")
+    return total
+
+
+#====================================
+# Consultas
+#====================================
+def _expresion_fts(palabras):
+    # Cada palabra como prefijo; varias palabras = todas deben aparecer
+    return ' '.join(f'"{p}"*' for p in palabras)
+
+
+def _coincidencias_terminos(palabras):
+    """Clientes con todas las ``palabras`` (como prefijo) y su puntaje, agrupados por cliente."""
+    from .models import TerminoBusqueda
+    filtros = [filtro_prefijo('termino', p[:_LARGO_TERMINO]) for p in palabras]
+    banderas = {
+        f'p{i}': Max(Case(When(filtro, then=1), default=0)) for i, filtro in enumerate(filtros)
+    }
+    return (
+        TerminoBusqueda.objects.filter(reduce(or_, filtros))
+        .values('cliente_id')
+        .annotate(puntaje=Sum('peso'), **banderas)
+        .filter(**{bandera: 1 for bandera in banderas})
+    )
+
+
+def filtro_busqueda(texto):
+    """``Q`` con todos los clientes que calzan con ``texto`` (``None`` si no hay palabras)."""
+    palabras = terminos(texto)
+    if not palabras:
+        return None
+    if usa_fts5():
+        return Q(pk__in=RawSQL(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [_expresion_fts(palabras)]
+        ))
+    return Q(pk__in=_coincidencias_terminos(palabras).values('cliente_id'))
+
+
+def buscar(clientes, texto, limite=LIMITE):
+    """
+    Los ``limite`` clientes de ``clientes`` más relevantes para ``texto``,
+    en orden de relevancia (lista de instancias, con el select_related /
+    prefetch_related de ``clientes``).
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+    alcance = clientes.order_by().values('pk')
+    if usa_fts5():
+        sql_alcance, params_alcance = alcance.query.sql_with_params()
+        pesos = ', '.join(str(float(p)) for p in PESOS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s AND rowid IN ({sql_alcance}) '
+                f'ORDER BY bm25({TABLA_FTS}, {pesos}) LIMIT %s',
+                [_expresion_fts(palabras), *params_alcance, limite],
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+    else:
+        ids = list(
+            _coincidencias_terminos(palabras).filter(cliente_id__in=alcance)
+            .order_by('-puntaje', 'cliente_id').values_list('cliente_id', flat=True)[:limite]
+        )
+    objetos = clientes.in_bulk(ids)
+    return [objetos[pk] for pk in ids if pk in objetos]
@@ -0,0 +1,116 @@
+"""
+Cambios de clientes y direcciones desde una marca de tiempo, para que las
+integraciones sincronicen solo lo modificado en vez de descargar todo.
+
+Una sincronización pide la ventana ``[desde, hasta)``: ``hasta`` lo fija
+la primera página (ahora menos ``CAMBIOS_MARGEN_SEGUNDOS``, para no
+perder filas de transacciones que todavía no confirmaban) y es el ``desde``
+de la siguiente sincronización. Un cliente entra en la ventana si cambió
+él o alguna de sus direcciones; los borrados salen de ``Eliminacion``.
+Un cliente reasignado deja una ``Eliminacion`` con el agente anterior,
+para que salga de la copia de ese agente. Las consultas usan los índices
+de ``modificado`` y ``eliminado``, así que el costo depende del volumen de
+cambios y no del tamaño de las tablas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Direccion, Eliminacion
+
+
+MARGEN = timedelta(seconds=getattr(settings, 'CAMBIOS_MARGEN_SEGUNDOS', 60))
+
+
+def interpretar_marca(valor):
+    """Marca ISO 8601 (sin zona = zona del sitio); ``ValueError`` si no es válida."""
+    valor = (valor or '').strip()
+    # Un '+' de la zona horaria sin codificar en la URL llega como espacio
+    fecha = parse_datetime(valor) or parse_datetime(valor[::-1].replace(' ', '+', 1)[::-1])
+    if fecha is None:
+        raise ValueError(valor)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def formatear_marca(fecha):
+    return fecha.isoformat()
+
+
+def ventana(params):
+    """
+    ``(desde, hasta)`` pedidos en ``params``. ``desde`` es obligatorio;
+    ``hasta`` se calcula si no viene. ``ValueError`` si alguna marca no es válida.
+    """
+    desde = interpretar_marca(params.get('desde', ''))
+    if params.get('hasta'):
+        hasta = interpretar_marca(params['hasta'])
+    else:
+        hasta = timezone.now() - MARGEN
+    return desde, max(desde, hasta)
+
+
+def clientes_cambiados(clientes, desde, hasta):
+    """Clientes de ``clientes`` modificados en la ventana o con direcciones modificadas o eliminadas."""
+    direcciones = Direccion.objects.filter(modificado__gte=desde, modificado__lt=hasta).values('cliente_id')
+    direcciones_eliminadas = Eliminacion.objects.filter(
+        modelo=Eliminacion.DIRECCION, eliminado__gte=desde, eliminado__lt=hasta,
+    ).values('cliente_id')
+    return clientes.filter(
+        Q(modificado__gte=desde, modificado__lt=hasta)
+        | Q(pk__in=direcciones)
+        | Q(pk__in=direcciones_eliminadas)
+    )
+
+
+def eliminados(perfil, desde, hasta):
+    """
+    ``{'clientes': [ids], 'direcciones': [ids]}`` borrados en la ventana y
+    visibles para ``perfil``. Para un agente, los clientes reasignados a otro
+    agente también salen de su alcance y se informan como borrados.
+    """
+    registros = Eliminacion.objects.filter(eliminado__gte=desde, eliminado__lt=hasta).exclude(
+        # Un cliente reasignado que sigue (o vuelve a estar) a la vista no se informa como borrado
+        modelo=Eliminacion.CLIENTE, cliente_id__in=perfil.clientes_visibles().values('pk'),
+    )
+    if not perfil.es_supervisor:
+        if perfil.agente is None:
+            return {'clientes': [], 'direcciones': []}
+        # Direcciones de sus clientes vigentes; las de clientes borrados van con el cliente
+        registros = registros.filter(
+            Q(modelo=Eliminacion.CLIENTE, agente_id=perfil.agente.pk)
+            | Q(modelo=Eliminacion.DIRECCION, cliente_id__in=perfil.clientes_visibles().values('pk'))
+        )
+    resultado = {'clientes': [], 'direcciones': []}
+    for modelo, objeto_id in registros.order_by('eliminado', 'pk').values_list('modelo', 'objeto_id'):
+        resultado['clientes' if modelo == Eliminacion.CLIENTE else 'direcciones'].append(objeto_id)
+    return resultado
+
+
+def registrar_eliminacion(instancia):
+    """Deja constancia del borrado de un ``Cliente`` o ``Direccion``."""
+    if isinstance(instancia, Direccion):
+        Eliminacion.objects.create(
+            modelo=Eliminacion.DIRECCION, objeto_id=instancia.pk, cliente_id=instancia.cliente_id,
+        )
+    else:
+        Eliminacion.objects.create(
+            modelo=Eliminacion.CLIENTE, objeto_id=instancia.pk, cliente_id=instancia.pk,
+            agente_id=instancia.agente_id,
+        )
+
+
+def registrar_reasignaciones(anteriores):
+    """
+    Deja constancia de los clientes que salieron del alcance de su agente
+    anterior. ``anteriores`` son pares ``(cliente_id, agente_id anterior)``.
+    """
+    Eliminacion.objects.bulk_create([
+        Eliminacion(modelo=Eliminacion.CLIENTE, objeto_id=cliente_id, cliente_id=cliente_id, agente_id=agente_id)
+        for cliente_id, agente_id in anteriores
+        if agente_id is not None
+    ])
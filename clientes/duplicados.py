@@ -0,0 +1,150 @@
+"""
+Detección de posibles clientes duplicados durante la importación.
+
+En vez de comparar cada fila contra toda la tabla ``Cliente``, cada lote
+importado se indexa en memoria por claves de bloqueo (nombre normalizado,
+correo y teléfono). Con esas mismas claves se traen, en una sola consulta
+sobre columnas indexadas, los clientes existentes que comparten alguna, y
+solo esos pares se comparan: el costo crece con las filas importadas y no
+con el tamaño de la tabla. Cada clave aporta a lo más ``MAX_CANDIDATOS``
+clientes guardados, y las que comparten demasiados (``MAX_POR_CLAVE``) no
+se buscan en la tabla.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Q
+
+from .models import CandidatoDuplicado, Cliente
+
+
+# Pares que se registran como máximo por cliente importado (una clave muy
+# repetida, como el teléfono de una central, no debe llenar el reporte)
+MAX_CANDIDATOS = 10
+# Una clave compartida por más clientes guardados que esto (el teléfono de una
+# central, un nombre genérico) no distingue a nadie: no se busca en la tabla
+MAX_POR_CLAVE = 100
+
+CAMPOS = ('pk', 'clave_nombre', 'email', 'telefono_normalizado')
+
+
+def _dominio(email):
+    return email.rsplit('@', 1)[-1].lower() if '@' in email else ''
+
+
+def claves_bloqueo(datos):
+    claves = []
+    if datos['clave_nombre']:
+        claves.append(('nombre', datos['clave_nombre']))
+    if datos['email']:
+        claves.append(('email', datos['email'].lower()))
+    if datos['telefono_normalizado']:
+        claves.append(('telefono', datos['telefono_normalizado']))
+    return claves
+
+
+def motivos(a, b):
+    """Razones por las que ``a`` y ``b`` parecen el mismo cliente (lista vacía si no)."""
+    encontrados = []
+    if a['clave_nombre'] and a['clave_nombre'] == b['clave_nombre']:
+        encontrados.append(CandidatoDuplicado.NOMBRE)
+    if a['email'].lower() == b['email'].lower():
+        encontrados.append(CandidatoDuplicado.EMAIL)
+    elif (a['telefono_normalizado'] and a['telefono_normalizado'] == b['telefono_normalizado']
+          and _dominio(a['email']) == _dominio(b['email'])):
+        # El teléfono solo no basta: puede ser el de una oficina compartida
+        encontrados.append(CandidatoDuplicado.DOMINIO_TELEFONO)
+    return encontrados
+
+
+def _claves_frecuentes(columna, valores, excluir):
+    """Valores de ``columna`` que ya tienen más de ``MAX_POR_CLAVE`` clientes guardados."""
+    if not valores:
+        return set()
+    return set(
+        Cliente.objects.filter(**{f'{columna}__in': valores})
+        .exclude(pk__in=excluir)
+        .values(columna)
+        .annotate(total=Count('pk'))
+        .filter(total__gt=MAX_POR_CLAVE)
+        .values_list(columna, flat=True)
+    )
+
+
+class DetectorDuplicados:
+    """Registra en ``CandidatoDuplicado`` los posibles duplicados de cada lote importado."""
+
+    def __init__(self, log):
+        self.log = log
+        self.detectados = 0
+
+    def revisar_lote(self, clientes, filas):
+        """
+        ``clientes`` son los recién creados (ya con pk) y ``filas`` su número
+        de fila en la planilla. Compara el lote consigo mismo y con los
+        clientes existentes, incluidos los de lotes anteriores.
+        """
+        indice = defaultdict(list)
+        nuevos = []
+        for cliente, fila in zip(clientes, filas):
+            datos = {campo: getattr(cliente, campo) for campo in CAMPOS}
+            datos['fila'] = fila
+            nuevos.append(datos)
+            for clave in claves_bloqueo(datos):
+                indice[clave].append(datos)
+
+        candidatos = {}
+        por_cliente = defaultdict(int)
+
+        def comparar(nuevo, otro):
+            par = (nuevo['pk'], otro['pk'])
+            if par in candidatos or por_cliente[nuevo['pk']] >= MAX_CANDIDATOS:
+                return
+            encontrados = motivos(nuevo, otro)
+            if encontrados:
+                por_cliente[nuevo['pk']] += 1
+                candidatos[par] = CandidatoDuplicado(
+                    importacion=self.log, fila=nuevo['fila'],
+                    cliente_id=nuevo['pk'], similar_id=otro['pk'], motivos=','.join(encontrados),
+                )
+
+        # Dentro del lote: cada fila contra las anteriores que comparten una
+        # clave (solo las más cercanas, para que un grupo grande no sea cuadrático)
+        for grupo in indice.values():
+            for i, nuevo in enumerate(grupo):
+                for otro in grupo[max(0, i - MAX_CANDIDATOS):i]:
+                    comparar(nuevo, otro)
+
+        # Contra los clientes ya guardados que comparten alguna clave
+        valores = defaultdict(set)
+        for tipo, valor in indice:
+            valores[tipo].add(valor)
+        if valores:
+            ids_nuevos = [n['pk'] for n in nuevos]
+            valores['nombre'] -= _claves_frecuentes('clave_nombre', valores['nombre'], ids_nuevos)
+            valores['telefono'] -= _claves_frecuentes('telefono_normalizado', valores['telefono'], ids_nuevos)
+            # email__in con la forma original y en minúsculas: iexact no usaría el índice
+            emails = valores['email'] | {n['email'] for n in nuevos}
+            filtro = (
+                Q(clave_nombre__in=valores['nombre'])
+                | Q(email__in=emails)
+                | Q(telefono_normalizado__in=valores['telefono'])
+            )
+            existentes = (
+                Cliente.objects.filter(filtro)
+                .exclude(pk__in=ids_nuevos)
+                .order_by('-pk')
+                .values(*CAMPOS)
+            )
+            # Por clave, solo los MAX_CANDIDATOS guardados más recientes
+            por_clave = defaultdict(int)
+            for existente in existentes.iterator():
+                for clave in claves_bloqueo(existente):
+                    if clave not in indice or por_clave[clave] >= MAX_CANDIDATOS:
+                        continue
+                    por_clave[clave] += 1
+                    for nuevo in indice[clave]:
+                        comparar(nuevo, existente)
+
+        if candidatos:
+            CandidatoDuplicado.objects.bulk_create(candidatos.values())
+            self.detectados += len(candidatos)
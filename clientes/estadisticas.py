@@ -0,0 +1,51 @@
+"""
+Estadísticas del dashboard de supervisión.
+
+Se calculan con tres consultas (agregación condicional sobre ``Cliente``, un
+``annotate(Count)`` por agente y la última ``ImportacionLog``) y se guardan
+en la caché de Django. Las señales de ``clientes/signals.py`` invalidan la
+entrada cuando cambian los datos y ``ESTADISTICAS_CACHE_TTL`` acota lo que
+pueda quedar desfasado (por ejemplo, durante una importación masiva).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import AgenteVentas, Cliente, ImportacionLog
+
+
+CLAVE_CACHE = 'clientes:estadisticas'
+TTL = getattr(settings, 'ESTADISTICAS_CACHE_TTL', 60)
+
+
+def calcular_estadisticas():
+    contexto = Cliente.objects.aggregate(
+        total_clientes=Count('pk'),
+        sin_agente=Count('pk', filter=Q(agente__isnull=True)),
+        activos=Count('pk', filter=Q(activo=True)),
+        inactivos=Count('pk', filter=Q(activo=False)),
+    )
+    contexto['clientes_por_agente'] = dict(
+        AgenteVentas.objects
+        .annotate(total=Count('cliente'))
+        .order_by('nombre')
+        .values_list('nombre', 'total')
+    )
+    contexto['ultima_importacion'] = (
+        ImportacionLog.objects.select_related('usuario').order_by('-fecha').first()
+    )
+    return contexto
+
+
+def obtener_estadisticas():
+    contexto = cache.get(CLAVE_CACHE)
+    if contexto is None:
+        contexto = calcular_estadisticas()
+        cache.set(CLAVE_CACHE, contexto, TTL)
+    return contexto
+
+
+def invalidar_estadisticas():
+    # Al confirmar, para que no se vuelva a cachear lo previo a la transacción
+    transaction.on_commit(lambda: cache.delete(CLAVE_CACHE))
@@ -0,0 +1,346 @@
+"""
+Exportaciones de clientes y direcciones.
+
+Las filas se leen desde la base de datos con ``.iterator()`` en bloques y el
+archivo .xlsx se escribe directamente sobre un zip en streaming: la memoria
+usada se mantiene constante sin importar cuántas direcciones existan y los
+primeros bytes llegan al navegador apenas se procesa el primer bloque.
+
+El PDF se arma con reportlab (platypus): una tabla por bloque de filas,
+entregadas a medida que se van dibujando las páginas.
+"""
+import re
+import zipfile
+from itertools import islice
+from xml.sax.saxutils import escape as xml_escape
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Table, TableStyle
+
+from .models import Direccion
+
+
+ENCABEZADOS_CLIENTES = ["Cliente", "Correo", "Comuna", "Ciudad", "Dirección", "País"]
+ENCABEZADOS_CAMBIOS = ["Id", "Estado", "Cliente", "Correo", "Comuna", "Ciudad", "Dirección", "País", "Modificado"]
+
+# Filas leídas por cada viaje a la base de datos
+TAMANO_BLOQUE = getattr(settings, 'EXPORTACION_TAMANO_BLOQUE', 2000)
+# Filas iniciales usadas para calcular el ancho de las columnas
+MUESTRA_ANCHOS = getattr(settings, 'EXPORTACION_MUESTRA_ANCHOS', 500)
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Caracteres de control que no son válidos en XML (openpyxl también los rechaza)
+_CARACTERES_ILEGALES = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def direcciones_visibles(perfil):
+    """Direcciones que puede exportar el usuario (ver ``PerfilUsuario``)."""
+    if perfil.es_supervisor:
+        return Direccion.objects.all()
+    if perfil.agente is not None:
+        return Direccion.objects.filter(cliente__agente=perfil.agente)
+    return Direccion.objects.none()
+
+
+def alcance_exportacion(perfil):
+    """Identifica el conjunto de filas exportadas, para nombrar archivos en caché."""
+    if perfil.es_supervisor:
+        return 'todos'
+    if perfil.agente is not None:
+        return f'agente{perfil.agente.pk}'
+    return 'ninguno'
+
+
+def filas_clientes_direcciones(queryset=None):
+    """
+    Devuelve un iterador con una fila por cada dirección de cliente,
+    en el mismo orden y formato que la consulta en pantalla.
+    """
+    if queryset is None:
+        queryset = Direccion.objects.all()
+    filas = (
+        queryset
+        .order_by('cliente_id', 'pk')
+        .values_list('cliente__nombre_razon_social', 'cliente__email',
+                     'comuna', 'ciudad', 'calle', 'numero', 'pais')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    for nombre, email, comuna, ciudad, calle, numero, pais in filas:
+        yield [nombre, email, comuna, ciudad, f"{calle} {numero}", pais]
+
+
+def filas_cambios(clientes, ids_eliminados, desde):
+    """
+    Filas de la exportación de cambios (ver cambios.py): una por dirección
+    de los clientes de ``clientes``, marcadas "nuevo" o "modificado" según
+    se hayan creado antes o después de ``desde``, y una por cliente eliminado.
+    """
+    filas = (
+        Direccion.objects
+        .filter(cliente_id__in=clientes.values('pk'))
+        .order_by('cliente_id', 'pk')
+        .values_list('cliente_id', 'cliente__creado', 'cliente__modificado', 'cliente__nombre_razon_social',
+                     'cliente__email', 'comuna', 'ciudad', 'calle', 'numero', 'pais')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    for cliente_id, creado, modificado, nombre, email, comuna, ciudad, calle, numero, pais in filas:
+        estado = "nuevo" if creado >= desde else "modificado"
+        yield [cliente_id, estado, nombre, email, comuna, ciudad, f"{calle} {numero}", pais, modificado.isoformat()]
+    for cliente_id in ids_eliminados:
+        yield [cliente_id, "eliminado", '', '', '', '', '', '', '']
+
+
+#====================================
+# Escritura de .xlsx en streaming
+#====================================
+class _BufferSalida:
+    """
+    Destino de escritura sin ``seek``/``tell``: zipfile lo detecta y escribe
+    descriptores de datos, lo que permite vaciar el buffer a medida que avanza.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{titulo}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    return _CARACTERES_ILEGALES.sub('', str(valor))
+
+
+def _fila_xml(valores):
+    celdas = []
+    for valor in valores:
+        texto = _texto(valor)
+        if texto:
+            celdas.append(
+                '<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % xml_escape(texto)
+            )
+        else:
+            celdas.append('<c/>')
+    return '<row>%s</row>' % ''.join(celdas)
+
+
+def _anchos_columnas(encabezados, muestra):
+    anchos = [len(str(e)) for e in encabezados]
+    for fila in muestra:
+        for i, valor in enumerate(fila):
+            largo = len(_texto(valor))
+            if largo > anchos[i]:
+                anchos[i] = largo
+    return [ancho + 2 for ancho in anchos]
+
+
+def generar_excel(encabezados, filas, titulo="Hoja1"):
+    """
+    Genera un .xlsx en streaming y lo devuelve como iterador de bytes.
+
+    El ancho de cada columna se calcula sobre las primeras ``MUESTRA_ANCHOS``
+    filas, ya que ``<cols>`` debe escribirse antes que los datos.
+    """
+    filas = iter(filas)
+    muestra = list(islice(filas, MUESTRA_ANCHOS))
+    anchos = _anchos_columnas(encabezados, muestra)
+
+    salida = _BufferSalida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(titulo=xml_escape(titulo[:31], {'"': '&quot;'})))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', _STYLES)
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            cols = ''.join(
+                '<col min="%d" max="%d" width="%d" customWidth="1"/>' % (i, i, ancho)
+                for i, ancho in enumerate(anchos, start=1)
+            )
+            hoja.write(('%s<cols>%s</cols><sheetData>%s' % (
+                _INICIO_HOJA, cols, _fila_xml(encabezados))).encode('utf-8'))
+            hoja.write(''.join(_fila_xml(f) for f in muestra).encode('utf-8'))
+            del muestra
+            yield salida.vaciar()
+
+            while True:
+                bloque = list(islice(filas, TAMANO_BLOQUE))
+                if not bloque:
+                    break
+                hoja.write(''.join(_fila_xml(f) for f in bloque).encode('utf-8'))
+                datos = salida.vaciar()
+                if datos:
+                    yield datos
+
+            hoja.write(b'</sheetData></worksheet>')
+    yield salida.vaciar()
+
+
+#====================================
+# PDF con reportlab
+#====================================
+# Filas por tabla; platypus parte cada tabla entre páginas si no cabe
+PDF_FILAS_POR_TABLA = 200
+PDF_ANCHOS = [6.5 * cm, 5.5 * cm, 3.5 * cm, 3.5 * cm, 5 * cm, 2.7 * cm]
+# Textos más largos que esto se envuelven en Paragraph (más lento que texto plano)
+_PDF_LARGO_MAXIMO = 30
+
+_ESTILO_CELDA = ParagraphStyle('celda', fontName='Helvetica', fontSize=7, leading=8)
+_ESTILO_TABLA = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica', 7),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#cccccc')),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+_ESTILO_ENCABEZADO = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 8),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f2f2f2')),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#cccccc')),
+])
+
+
+class _FlowablesPerezosos(list):
+    """
+    Lista que platypus va consumiendo por delante y que se rellena desde un
+    generador: solo hay unas pocas tablas en memoria a la vez.
+    """
+    def __init__(self, generador, minimo=2):
+        super().__init__()
+        self._generador = generador
+        self._minimo = minimo
+
+    def _rellenar(self):
+        while self._generador is not None and list.__len__(self) < self._minimo:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                self._generador = None
+
+    def __len__(self):
+        self._rellenar()
+        return list.__len__(self)
+
+    def __getitem__(self, indice):
+        self._rellenar()
+        return list.__getitem__(self, indice)
+
+
+def _celda_pdf(valor):
+    texto = _texto(valor)
+    if len(texto) > _PDF_LARGO_MAXIMO:
+        return Paragraph(xml_escape(texto), _ESTILO_CELDA)
+    return texto
+
+
+def _tablas_pdf(filas):
+    for bloque in iter(lambda: list(islice(filas, PDF_FILAS_POR_TABLA)), []):
+        yield Table([[_celda_pdf(v) for v in fila] for fila in bloque],
+                    colWidths=PDF_ANCHOS, style=_ESTILO_TABLA)
+
+
+def generar_pdf(destino, encabezados, filas, titulo="Clientes y Direcciones"):
+    """
+    Escribe el PDF en ``destino`` (archivo o HttpResponse). El título y los
+    encabezados de columna se dibujan en cada página.
+    """
+    tabla_encabezado = Table([encabezados], colWidths=PDF_ANCHOS, style=_ESTILO_ENCABEZADO)
+    pagina = landscape(A4)
+    margen = 1 * cm
+    _, alto_encabezado = tabla_encabezado.wrap(pagina[0], pagina[1])
+    alto_titulo = 0.8 * cm
+
+    def dibujar_encabezado(canvas, doc):
+        canvas.saveState()
+        arriba = pagina[1] - margen
+        canvas.setFont('Helvetica-Bold', 12)
+        canvas.drawCentredString(pagina[0] / 2, arriba - 0.5 * cm, titulo)
+        tabla_encabezado.drawOn(canvas, margen, arriba - alto_titulo - alto_encabezado)
+        canvas.setFont('Helvetica', 7)
+        canvas.drawRightString(pagina[0] - margen, margen / 2, str(doc.page))
+        canvas.restoreState()
+
+    doc = BaseDocTemplate(destino, pagesize=pagina, title=titulo,
+                          leftMargin=margen, rightMargin=margen, topMargin=margen, bottomMargin=margen)
+    marco = Frame(margen, margen, pagina[0] - 2 * margen,
+                  pagina[1] - 2 * margen - alto_titulo - alto_encabezado,
+                  leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0)
+    doc.addPageTemplates([PageTemplate(frames=[marco], onPage=dibujar_encabezado)])
+    doc.build(_FlowablesPerezosos(_tablas_pdf(iter(filas))))
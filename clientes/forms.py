@@ -3,7 +3,14 @@ from django.forms import inlineformset_factory
 from .models import Cliente, Direccion
 from django.forms.models import BaseInlineFormSet
 from django.core.exceptions import ValidationError
-from .models import ImportacionLog
+from django.db.models import Prefetch
+from django.http import QueryDict
+from django.utils.translation import gettext_lazy as _
+from .acciones import ACCIONES, REASIGNAR, TIPO_ENTIDAD
+from .busqueda import buscar, filtro_busqueda
+from .models import ImportacionLog, AgenteVentas, TipoEntidad
+from .normalizacion import filtro_prefijo, normalizar_rut, normalizar_texto
+from .widgets import SelectAutocompletar
 
 
 class ClienteForm(forms.ModelForm):
@@ -21,7 +28,7 @@ class ClienteForm(forms.ModelForm):
             'agente',
         ]
         widgets = {
-            'tipo_entidad':        forms.Select(attrs={'class': 'form-select'}),
+            'tipo_entidad':        SelectAutocompletar('tipos-entidad'),
             'nombre_razon_social': forms.TextInput(attrs={'class': 'form-control', 'required': True}),
             'rut':                 forms.TextInput(attrs={'class': 'form-control'}),
             'email':               forms.EmailInput(attrs={'class': 'form-control'}),
@@ -29,7 +36,7 @@ class ClienteForm(forms.ModelForm):
             'sitio_web':           forms.URLInput(attrs={'class': 'form-control'}),
             'activo':              forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'observacion':         forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
-            'agente':              forms.Select(attrs={'class': 'form-select', 'required': True}),
+            'agente':              SelectAutocompletar('agentes', attrs={'required': True}),
         }
 
 def clean_agente(self):
@@ -44,7 +51,7 @@ class DireccionForm(forms.ModelForm):
         model = Direccion
         exclude = ('cliente',)
         widgets = {
-            'tipo':             forms.Select(attrs={'class': 'form-select', 'required': True}),
+            'tipo':             SelectAutocompletar('tipos-direccion', attrs={'required': True}),
             'calle':            forms.TextInput(attrs={'class': 'form-control', 'required': True}),
             'numero':           forms.TextInput(attrs={'class': 'form-control', 'required': True}),
             'comuna':           forms.TextInput(attrs={'class': 'form-control', 'required': True}),
@@ -83,5 +90,129 @@ class ImportacionForm(forms.ModelForm):
         model = ImportacionLog
         fields = ['archivo']
         widgets = {
-            'archivo': forms.ClearableFileInput(attrs={'accept': '.xlsx'}),
+            'archivo': forms.ClearableFileInput(attrs={'accept': '.xlsx,.csv,.tsv'}),
         }
+
+
+class ConsultaClientesForm(forms.Form):
+    """
+    Filtros de la consulta de clientes. Todos se traducen a condiciones SQL
+    sobre columnas indexadas (ver `filtrar`).
+    """
+    ACTIVO_CHOICES = [('', _("Todos")), ('1', _("Activos")), ('0', _("Inactivos"))]
+
+    q      = forms.CharField(required=False, label=_("Buscar"),
+                             widget=forms.TextInput(attrs={'class': 'form-control',
+                                                           'placeholder': _("Nombre, RUT, correo, dirección...")}))
+    nombre = forms.CharField(required=False, label=_("Nombre o Razón Social"),
+                             widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': _("Comienza con...")}))
+    rut    = forms.CharField(required=False, label=_("Rut"),
+                             widget=forms.TextInput(attrs={'class': 'form-control'}))
+    comuna = forms.CharField(required=False, label=_("Comuna"),
+                             widget=forms.TextInput(attrs={'class': 'form-control'}))
+    ciudad = forms.CharField(required=False, label=_("Ciudad"),
+                             widget=forms.TextInput(attrs={'class': 'form-control'}))
+    pais   = forms.CharField(required=False, label=_("País"),
+                             widget=forms.TextInput(attrs={'class': 'form-control'}))
+    agente = forms.ModelChoiceField(queryset=AgenteVentas.objects.all(), required=False, label=_("Agente"),
+                                    empty_label=_("Todos"), widget=SelectAutocompletar('agentes'))
+    activo = forms.ChoiceField(choices=ACTIVO_CHOICES, required=False, label=_("Activo"),
+                               widget=forms.Select(attrs={'class': 'form-select'}))
+
+    def filtrar(self, clientes):
+        """
+        Aplica los filtros a ``clientes`` y precarga solo las direcciones que
+        coinciden con los filtros de dirección.
+        """
+        datos = self.cleaned_data
+        if datos.get('q'):
+            # Índice de texto completo (busqueda.py); el orden por relevancia lo da buscar()
+            filtro = filtro_busqueda(datos['q'])
+            clientes = clientes.filter(filtro) if filtro is not None else clientes.none()
+        if datos.get('nombre'):
+            clientes = clientes.filter(filtro_prefijo('nombre_normalizado', normalizar_texto(datos['nombre'])))
+        if datos.get('rut'):
+            # Igual con o sin puntos y guion; un RUT inválido solo puede calzar tal cual
+            canonico = normalizar_rut(datos['rut'])
+            if canonico:
+                clientes = clientes.filter(rut_normalizado=canonico)
+            else:
+                clientes = clientes.filter(rut=datos['rut'].strip())
+        if datos.get('agente'):
+            clientes = clientes.filter(agente=datos['agente'])
+        if datos.get('activo'):
+            clientes = clientes.filter(activo=datos['activo'] == '1')
+
+        direcciones = Direccion.objects.all()
+        filtro_direccion = {
+            campo: datos[campo].strip()
+            for campo in ('comuna', 'ciudad', 'pais')
+            if datos.get(campo)
+        }
+        if filtro_direccion:
+            direcciones = direcciones.filter(**filtro_direccion)
+            clientes = clientes.filter(pk__in=direcciones.values('cliente_id'))
+
+        return clientes.prefetch_related(Prefetch('direcciones', queryset=direcciones))
+
+
+class ListaIdsField(forms.Field):
+    """Ids enviados como varios valores con el mismo nombre (checkboxes de la lista)."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return sorted({int(v) for v in value or ()})
+        except (TypeError, ValueError):
+            raise ValidationError(_("Selección inválida."))
+
+
+class AccionMasivaForm(forms.Form):
+    """
+    Acción masiva de supervisor. Se aplica a los clientes marcados
+    (``seleccion``) o, si no hay marcados, a los que calzan con el filtro de
+    la consulta (``filtro``, la querystring de ``ConsultaClientesForm``).
+    Con búsqueda de texto el filtro abarca solo los resultados que muestra la
+    consulta (``busqueda.LIMITE``), no todas las coincidencias.
+    """
+    accion       = forms.ChoiceField(choices=ACCIONES, label=_("Acción"),
+                                     widget=forms.Select(attrs={'class': 'form-select'}))
+    agente       = forms.ModelChoiceField(queryset=AgenteVentas.objects.all(), required=False, label=_("Agente"),
+                                          widget=SelectAutocompletar('agentes'))
+    tipo_entidad = forms.ModelChoiceField(queryset=TipoEntidad.objects.all(), required=False,
+                                          label=_("Tipo de Entidad"),
+                                          widget=SelectAutocompletar('tipos-entidad'))
+    seleccion    = ListaIdsField(required=False)
+    filtro       = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean(self):
+        datos = super().clean()
+        accion = datos.get('accion')
+        if accion == REASIGNAR and not datos.get('agente'):
+            self.add_error('agente', _("Debes seleccionar un agente."))
+        if accion == TIPO_ENTIDAD and not datos.get('tipo_entidad'):
+            self.add_error('tipo_entidad', _("Debes seleccionar un tipo de entidad."))
+
+        self.consulta = None
+        if not datos.get('seleccion'):
+            consulta = ConsultaClientesForm(QueryDict(datos.get('filtro', '')))
+            # Sin ningún filtro la acción tocaría todos los clientes: se exige uno
+            if not consulta.is_valid() or not any(consulta.cleaned_data.values()):
+                raise ValidationError(_("Selecciona clientes o aplica un filtro."))
+            self.consulta = consulta
+        return datos
+
+    def clientes(self):
+        """Queryset sobre el que se ejecuta el ``UPDATE``."""
+        if self.consulta is None:
+            return Cliente.objects.filter(pk__in=self.cleaned_data['seleccion'])
+        clientes = self.consulta.filtrar(Cliente.objects.all())
+        texto = self.consulta.cleaned_data.get('q')
+        if texto:
+            # La consulta muestra solo los busqueda.LIMITE más relevantes: la acción no va más allá
+            clientes = Cliente.objects.filter(pk__in=[c.pk for c in buscar(clientes.prefetch_related(None), texto)])
+        return clientes
+
+    def parametros(self):
+        datos = self.cleaned_data
+        return {'accion': datos['accion'], 'agente': datos['agente'], 'tipo_entidad': datos['tipo_entidad']}
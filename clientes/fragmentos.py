@@ -0,0 +1,73 @@
+"""
+Caché de las filas renderizadas de ``lista_clientes``.
+
+Cada listado tiene un alcance (``'todos'`` para supervisores o el id del
+agente) con su propia generación en la caché; la clave de cada página
+incluye esa generación, por lo que invalidar un alcance es solo cambiar su
+generación. Las señales de ``clientes/signals.py`` invalidan únicamente los
+alcances afectados por cada cambio.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+
+
+TTL = getattr(settings, 'LISTA_CACHE_TTL', 600)
+
+TODOS = 'todos'
+# Cambios que afectan a todos los listados (p. ej. renombrar un TipoEntidad)
+GLOBAL = 'global'
+
+
+def _clave_generacion(alcance):
+    return f'clientes:lista:gen:{alcance}'
+
+
+def generacion(alcance):
+    clave = _clave_generacion(alcance)
+    valor = cache.get(clave)
+    if valor is None:
+        valor = time.time_ns()
+        cache.add(clave, valor, None)
+        valor = cache.get(clave, valor)
+    return valor
+
+
+def invalidar_lista(*alcances):
+    alcances = [alcance for alcance in alcances if alcance is not None]
+
+    def cambiar_generacion():
+        for alcance in alcances:
+            cache.set(_clave_generacion(alcance), time.time_ns(), None)
+
+    # Al confirmar: si cambiara antes, otra petición podría cachear las filas
+    # previas a la transacción bajo la generación nueva y quedarían ahí
+    transaction.on_commit(cambiar_generacion)
+
+
+def alcance_lista(perfil):
+    if perfil.es_supervisor:
+        return TODOS
+    if perfil.agente is not None:
+        return perfil.agente.pk
+    return None
+
+
+def lista_cacheada(alcance, params, construir):
+    """
+    Devuelve el fragmento de la página pedida en ``params`` para ``alcance``,
+    llamando a ``construir()`` solo si no está en la caché.
+    """
+    consulta = hashlib.sha1(params.urlencode().encode('utf-8')).hexdigest()
+    clave = 'clientes:lista:%s:%s:%s:%s:%s' % (
+        alcance, generacion(GLOBAL), generacion(alcance), get_language(), consulta,
+    )
+    fragmento = cache.get(clave)
+    if fragmento is None:
+        fragmento = construir()
+        cache.set(clave, fragmento, TTL)
+    return fragmento
@@ -0,0 +1,434 @@
+"""
+Motor de importación de planillas de clientes.
+
+Las filas se procesan por lotes en dos etapas: la validación (sin tocar la
+base de datos) y la escritura. Un único escritor carga en una sola consulta
+los RUT y correos que ya existen y escribe clientes y direcciones con
+``bulk_create`` dentro de una transacción; es la etapa que domina el tiempo.
+Opcionalmente (``IMPORTACION_PROCESOS`` > 1) la validación de los lotes de
+planillas grandes se reparte en un pool de procesos.
+Los errores por fila se acumulan con el mismo formato de siempre
+(``{'fila': n, 'error': '...'}``) y se guardan en el ``ImportacionLog``,
+hasta ``IMPORTACION_MAX_ERRORES``; ``fallidos`` lleva el total.
+Cada lote se confirma en la misma transacción que su punto de control
+(``ultima_fila``, contadores y errores), así que una importación
+interrumpida se retoma desde el último lote guardado.
+"""
+import csv
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import busqueda
+from .duplicados import DetectorDuplicados
+from .models import Cliente, Direccion, ImportacionLog, TipoDireccion, TipoEntidad
+from .fragmentos import TODOS, invalidar_lista
+from .normalizacion import normalizar_rut
+from .versiones import marcar_cambio
+
+
+# Orden de las columnas en plantilla_clientes.xlsx
+COLUMNAS = (
+    'tipo', 'nombre', 'rut', 'email', 'telefono', 'web', 'obs_cli',
+    'calle', 'numero', 'comuna', 'ciudad', 'cp', 'pais', 'obs_dir',
+)
+CAMPOS_OBLIGATORIOS = ('nombre', 'rut', 'email', 'comuna', 'calle')
+
+TAMANO_LOTE = getattr(settings, 'IMPORTACION_TAMANO_LOTE', 1000)
+# La planilla no trae tipo de dirección: se usa (o crea) este tipo
+TIPO_DIRECCION = getattr(settings, 'IMPORTACION_TIPO_DIRECCION', 'Principal')
+
+# Validación en paralelo: procesos del pool y tamaño mínimo de planilla para usarlo
+# (en planillas chicas el costo de arrancar el pool supera lo que se gana)
+PROCESOS = getattr(settings, 'IMPORTACION_PROCESOS', 1)
+FILAS_PARALELO = getattr(settings, 'IMPORTACION_FILAS_PARALELO', 20000)
+
+# Errores por fila que se guardan en el log (el total queda en ``fallidos``);
+# sin tope, cada punto de control reescribiría un JSON cada vez más grande
+MAX_ERRORES = getattr(settings, 'IMPORTACION_MAX_ERRORES', 1000)
+
+FILA_INICIO = 2
+
+EXTENSIONES_PERMITIDAS = ('.xlsx', '.csv', '.tsv')
+
+
+def _largos_maximos():
+    """``max_length`` del campo del modelo donde termina cada columna."""
+    destinos = {
+        'nombre': (Cliente, 'nombre_razon_social'), 'rut': (Cliente, 'rut'),
+        'email': (Cliente, 'email'), 'telefono': (Cliente, 'telefono'), 'web': (Cliente, 'sitio_web'),
+        'calle': (Direccion, 'calle'), 'numero': (Direccion, 'numero'), 'comuna': (Direccion, 'comuna'),
+        'ciudad': (Direccion, 'ciudad'), 'cp': (Direccion, 'codigo_postal'), 'pais': (Direccion, 'pais'),
+    }
+    return {
+        columna: modelo._meta.get_field(campo).max_length
+        for columna, (modelo, campo) in destinos.items()
+    }
+
+
+LARGOS_MAXIMOS = _largos_maximos()
+
+
+def en_lotes(iterable, tamano):
+    """Agrupa un iterable en listas de a lo más ``tamano`` elementos."""
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def leer_planilla(archivo, nombre=None, fila_inicio=FILA_INICIO):
+    """
+    Abre la planilla según su extensión y devuelve ``(total_filas, filas)``,
+    donde ``filas`` entrega tuplas ``(numero_fila, valores)`` sin cargar
+    el archivo completo en memoria. ``archivo`` puede ser la ruta en disco
+    (lo habitual) o un archivo binario ya abierto.
+    """
+    extension = os.path.splitext(nombre or str(archivo))[1].lower()
+    if extension in ('.csv', '.tsv'):
+        return _leer_texto(archivo, extension, fila_inicio)
+    return _leer_xlsx(archivo, fila_inicio)
+
+
+def _leer_xlsx(archivo, fila_inicio):
+    # read_only recorre el XML de la hoja sin crear objetos Cell por celda
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    sheet = wb.active
+    total = max(0, (sheet.max_row or 0) - fila_inicio + 1)
+
+    def filas():
+        try:
+            for idx, valores in enumerate(
+                sheet.iter_rows(min_row=fila_inicio, values_only=True), start=fila_inicio
+            ):
+                yield idx, valores
+        finally:
+            wb.close()
+
+    return total, filas()
+
+
+def _leer_texto(archivo, extension, fila_inicio):
+    """CSV/TSV con las mismas columnas que plantilla_clientes.xlsx."""
+    abierto = isinstance(archivo, (str, os.PathLike))
+    if abierto:
+        archivo = open(archivo, 'rb')
+    total = 0
+    for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+        total += bloque.count(b'\n')
+    archivo.seek(0)
+    muestra = archivo.read(64 * 1024)
+    archivo.seek(0)
+
+    try:
+        muestra.decode('utf-8')
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError:
+        # Excel en español guarda los CSV en Windows-1252
+        codificacion = 'cp1252'
+
+    if extension == '.tsv':
+        delimitador = '\t'
+    else:
+        try:
+            delimitador = csv.Sniffer().sniff(
+                muestra.decode(codificacion, errors='ignore'), delimiters=',;\t'
+            ).delimiter
+        except csv.Error:
+            delimitador = ','
+
+    texto = io.TextIOWrapper(archivo, encoding=codificacion, newline='')
+    lector = csv.reader(texto, delimiter=delimitador)
+
+    def filas():
+        try:
+            for idx, valores in enumerate(lector, start=1):
+                if idx >= fila_inicio:
+                    yield idx, valores
+        finally:
+            if abierto:
+                texto.close()
+
+    return max(0, total - fila_inicio + 1), filas()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    # Excel entrega los números enteros (RUT, teléfono) como float
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def validar_fila(valores, tipos_entidad):
+    """
+    Valida una fila sin tocar la base de datos.
+
+    ``tipos_entidad`` es un diccionario ``nombre en minúsculas -> id``.
+    Devuelve ``(datos, None)`` si la fila es válida o ``(None, error)``.
+    """
+    valores = tuple(valores)[:len(COLUMNAS)]
+    valores += (None,) * (len(COLUMNAS) - len(valores))
+    datos = {campo: _texto(valor) for campo, valor in zip(COLUMNAS, valores)}
+
+    if not any(datos.values()):
+        return None, None
+
+    if not all(datos[campo] for campo in CAMPOS_OBLIGATORIOS):
+        return None, 'Faltan campos obligatorios'
+
+    datos['rut_normalizado'] = normalizar_rut(datos['rut'])
+    if datos['rut_normalizado'] is None:
+        return None, f'RUT inválido: {datos["rut"]}'
+
+    try:
+        validate_email(datos['email'])
+    except ValidationError:
+        return None, f'Correo inválido: {datos["email"]}'
+
+    for columna, largo in LARGOS_MAXIMOS.items():
+        if len(datos[columna]) > largo:
+            return None, f'{columna} supera los {largo} caracteres'
+
+    tipo = datos.pop('tipo')
+    datos['tipo_entidad_id'] = None
+    if tipo:
+        datos['tipo_entidad_id'] = tipos_entidad.get(tipo.lower())
+        if datos['tipo_entidad_id'] is None:
+            return None, f'Tipo de entidad no existe: {tipo}'
+
+    return datos, None
+
+
+def validar_bloque(bloque, tipos_entidad):
+    """
+    Valida un lote ``[(numero_fila, valores), ...]`` y devuelve
+    ``[(numero_fila, datos, error), ...]``. Es lo que ejecutan los procesos
+    del pool, por lo que no debe tocar la base de datos.
+    """
+    return [(idx, *validar_fila(valores, tipos_entidad)) for idx, valores in bloque]
+
+
+def lotes_validados(filas, tamano, tipos_entidad, procesos=1):
+    """
+    Entrega, en orden, cada lote de ``filas`` ya validado. Con más de un
+    proceso los lotes se validan en paralelo, manteniendo a lo más dos por
+    proceso en vuelo para no cargar la planilla entera en memoria.
+    """
+    lotes = en_lotes(filas, tamano)
+    if procesos <= 1:
+        for lote in lotes:
+            yield validar_bloque(lote, tipos_entidad)
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        en_vuelo = deque()
+        for lote in lotes:
+            en_vuelo.append(pool.submit(validar_bloque, lote, tipos_entidad))
+            if len(en_vuelo) >= procesos * 2:
+                yield en_vuelo.popleft().result()
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
+
+
+class ImportadorClientes:
+    """
+    Importa filas de la planilla en lotes y registra el resultado en ``log``.
+    """
+
+    def __init__(self, log, tamano_lote=None, procesos=None):
+        self.log = log
+        self.tamano_lote = tamano_lote or TAMANO_LOTE
+        self.procesos = procesos or PROCESOS
+        # Si la importación se interrumpió, se retoma desde su último punto de control
+        self.exitosos = log.exitosos
+        self.fallidos = log.fallidos
+        self.procesadas = log.procesadas
+        self.errores = json.loads(log.errores or '[]')
+        self._errores_guardados = len(self.errores)
+        self.ultima_fila = log.ultima_fila
+        self.tipos_entidad = {
+            nombre.strip().lower(): pk
+            for pk, nombre in TipoEntidad.objects.values_list('pk', 'nombre')
+        }
+        self._tipo_direccion = None
+        self.detector = DetectorDuplicados(log)
+
+    @property
+    def fila_inicio(self):
+        """Primera fila de la planilla que falta por importar."""
+        return max(FILA_INICIO, self.ultima_fila + 1)
+
+    @property
+    def tipo_direccion(self):
+        if self._tipo_direccion is None:
+            self._tipo_direccion, _ = TipoDireccion.objects.get_or_create(nombre=TIPO_DIRECCION)
+        return self._tipo_direccion
+
+    def importar(self, filas, total=None):
+        """
+        Procesa las filas ``(numero_fila, valores)`` y guarda el log. Las
+        filas hasta ``ultima_fila`` ya están importadas y se saltan; ``total``
+        es la cantidad de filas que faltan.
+        """
+        self.log.estado = ImportacionLog.EN_PROCESO
+        if total is not None:
+            self.log.total_filas = self.procesadas + total
+        self.log.save(update_fields=['estado', 'total_filas'])
+
+        pendientes = ((idx, valores) for idx, valores in filas if idx >= self.fila_inicio)
+        procesos = self.procesos if total is None or total >= FILAS_PARALELO else 1
+        for lote in lotes_validados(pendientes, self.tamano_lote, self.tipos_entidad, procesos):
+            # El lote y su punto de control se confirman juntos: si el proceso
+            # muere, la importación se retoma justo después del último lote guardado
+            with transaction.atomic():
+                self.procesar_lote(lote)
+                self.procesadas += len(lote)
+                self.ultima_fila = lote[-1][0]
+                self.registrar_avance()
+
+        self.log.estado = ImportacionLog.TERMINADO
+        self.guardar_resultado()
+        return self.log
+
+    def registrar_avance(self):
+        """Punto de control: contadores, última fila confirmada y errores nuevos."""
+        campos = {
+            'procesadas': self.procesadas,
+            'exitosos': self.exitosos,
+            'fallidos': self.fallidos,
+            'ultima_fila': self.ultima_fila,
+            'actualizado': timezone.now(),
+        }
+        if len(self.errores) != self._errores_guardados:
+            campos['errores'] = json.dumps(self.errores, ensure_ascii=False)
+            self._errores_guardados = len(self.errores)
+        ImportacionLog.objects.filter(pk=self.log.pk).update(**campos)
+
+    def registrar_error(self, fila, error):
+        self.fallidos += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({'fila': fila, 'error': error})
+
+    def procesar_lote(self, lote):
+        """Escribe un lote ya validado (``[(numero_fila, datos, error), ...]``)."""
+        validas = []
+        for idx, datos, error in lote:
+            if error:
+                self.registrar_error(idx, error)
+            elif datos:
+                validas.append((idx, datos))
+        if validas:
+            self.escribir_lote(validas)
+
+    def escribir_lote(self, validas):
+        """
+        Descarta duplicados con una sola consulta y escribe el lote. Los RUT
+        se comparan en su forma canónica ("12.345.678-5" = "123456785"); el
+        RUT tal como viene escrito se revisa además por los registros
+        antiguos que no tienen ``rut_normalizado``.
+        """
+        canonicos = {datos['rut_normalizado'] for _, datos in validas}
+        ruts = {datos['rut'] for _, datos in validas}
+        emails = {datos['email'] for _, datos in validas}
+        ruts_usados, emails_usados = set(), set()
+        for rut, canonico, email in Cliente.objects.filter(
+            Q(rut_normalizado__in=canonicos) | Q(rut__in=ruts) | Q(email__in=emails)
+        ).values_list('rut', 'rut_normalizado', 'email'):
+            ruts_usados.update((rut, canonico))
+            emails_usados.add(email)
+
+        nuevos, filas = [], []
+        for idx, datos in validas:
+            if datos['rut_normalizado'] in ruts_usados or datos['rut'] in ruts_usados:
+                self.registrar_error(idx, 'Cliente ya existe')
+                continue
+            if datos['email'] in emails_usados:
+                self.registrar_error(idx, 'Correo ya registrado')
+                continue
+            ruts_usados.update((datos['rut'], datos['rut_normalizado']))
+            emails_usados.add(datos['email'])
+            nuevos.append(datos)
+            filas.append(idx)
+
+        if not nuevos:
+            return
+
+        clientes = [
+            Cliente(
+                tipo_entidad_id=datos['tipo_entidad_id'],
+                nombre_razon_social=datos['nombre'],
+                rut=datos['rut'],
+                email=datos['email'],
+                telefono=datos['telefono'],
+                sitio_web=datos['web'],
+                observacion=datos['obs_cli'],
+            )
+            for datos in nuevos
+        ]
+        # bulk_create no llama a save(): los campos derivados se calculan aquí
+        for cliente in clientes:
+            cliente.actualizar_campos_normalizados()
+
+        # Corre dentro de la transacción del lote abierta en importar()
+        clientes = Cliente.objects.bulk_create(clientes, batch_size=self.tamano_lote)
+
+        # Backends sin RETURNING no asignan pk en bulk_create
+        if clientes and clientes[0].pk is None:
+            pks = dict(Cliente.objects.filter(
+                rut_normalizado__in=[c.rut_normalizado for c in clientes]
+            ).values_list('rut_normalizado', 'pk'))
+            for cliente in clientes:
+                cliente.pk = pks[cliente.rut_normalizado]
+
+        tipo = self.tipo_direccion
+        Direccion.objects.bulk_create([
+            Direccion(
+                cliente_id=cliente.pk,
+                tipo=tipo,
+                calle=datos['calle'],
+                numero=datos['numero'],
+                comuna=datos['comuna'],
+                ciudad=datos['ciudad'],
+                codigo_postal=datos['cp'],
+                pais=datos['pais'],
+                observacion=datos['obs_dir'],
+            )
+            for cliente, datos in zip(clientes, nuevos)
+        ], batch_size=self.tamano_lote)
+
+        self.detector.revisar_lote(clientes, filas)
+        busqueda.indexar([cliente.pk for cliente in clientes])
+
+        # bulk_create no envía señales (los importados no tienen agente).
+        # La lista se invalida al confirmar el lote (on_commit)
+        marcar_cambio()
+        invalidar_lista(TODOS)
+
+        self.exitosos += len(nuevos)
+
+    def guardar_resultado(self):
+        self.errores.sort(key=lambda e: e['fila'])
+        self.log.exitosos = self.exitosos
+        self.log.fallidos = self.fallidos
+        self.log.procesadas = self.procesadas
+        self.log.ultima_fila = self.ultima_fila
+        self.log.actualizado = timezone.now()
+        self.log.errores = json.dumps(self.errores, ensure_ascii=False, indent=2)
+        self.log.save(update_fields=[
+            'exitosos', 'fallidos', 'procesadas', 'ultima_fila', 'actualizado', 'errores', 'estado',
+        ])
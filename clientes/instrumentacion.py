@@ -0,0 +1,189 @@
+"""
+Medición de tiempos por petición (SQL, plantillas y total).
+
+``InstrumentacionMiddleware`` abre una ``Medicion`` por petición; las
+consultas se miden con ``connection.execute_wrapper`` y el render de
+plantillas envolviendo ``Template.render`` del backend de Django. Cada
+proceso acumula las muestras por vista en memoria y las vuelca cada pocos
+segundos a la caché compartida, desde donde la página de rendimiento
+calcula los percentiles.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_MS = getattr(settings, 'INSTRUMENTACION_UMBRAL_MS', 500)
+UMBRAL_CONSULTAS = getattr(settings, 'INSTRUMENTACION_UMBRAL_CONSULTAS', 50)
+# Consultas más lentas que se guardan por petición para el log
+CONSULTAS_LENTAS = 3
+# Muestras que se conservan por vista para calcular percentiles
+MUESTRAS_POR_VISTA = getattr(settings, 'INSTRUMENTACION_MUESTRAS', 500)
+INTERVALO_VOLCADO = 5
+
+CLAVE_CACHE = 'clientes:instrumentacion'
+
+_medicion_actual = ContextVar('medicion', default=None)
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.plantillas = 0.0
+        self.total = None
+        self._profundidad = 0
+        self._lentas = []
+
+    def medir_sql(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.sql += duracion
+            # Min-heap acotado: quedan solo las más lentas
+            if len(self._lentas) < CONSULTAS_LENTAS:
+                heapq.heappush(self._lentas, (duracion, sql))
+            else:
+                heapq.heappushpop(self._lentas, (duracion, sql))
+
+    def terminar(self):
+        self.total = time.perf_counter() - self.inicio
+
+    @property
+    def consultas_lentas(self):
+        return sorted(self._lentas, reverse=True)
+
+    def server_timing(self):
+        """Valor para la cabecera ``Server-Timing`` (milisegundos)."""
+        return ', '.join([
+            f'db;dur={self.sql * 1000:.1f};desc="{self.consultas} consultas"',
+            f'tpl;dur={self.plantillas * 1000:.1f};desc="Plantillas"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def es_lenta(self):
+        return self.total * 1000 > UMBRAL_MS or self.consultas > UMBRAL_CONSULTAS
+
+
+#====================================
+# Tiempo de render de plantillas
+#====================================
+_render_original = Template.render
+_instrumentado = False
+
+
+def _render_medido(self, context=None, request=None):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return _render_original(self, context, request)
+    # Si un render ocurre dentro de otro solo se suma el de más afuera
+    medicion._profundidad += 1
+    inicio = time.perf_counter()
+    try:
+        return _render_original(self, context, request)
+    finally:
+        medicion._profundidad -= 1
+        if medicion._profundidad == 0:
+            medicion.plantillas += time.perf_counter() - inicio
+
+
+def instrumentar_plantillas():
+    global _instrumentado
+    if not _instrumentado:
+        Template.render = _render_medido
+        _instrumentado = True
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _medicion_actual.set(medicion)
+
+
+def finalizar(token):
+    _medicion_actual.reset(token)
+
+
+#====================================
+# Muestras por vista
+#====================================
+_pendientes = {}
+_candado = threading.Lock()
+_ultimo_volcado = time.monotonic()
+
+
+def registrar(request, vista, medicion):
+    """Guarda la muestra de la petición y la deja en el log si supera los umbrales."""
+    global _ultimo_volcado
+    if medicion.es_lenta():
+        logger.warning(
+            "Petición lenta %s %s (%s): %.0f ms, %d consultas (%.0f ms SQL), %.0f ms plantillas.%s",
+            request.method, request.path, vista, medicion.total * 1000, medicion.consultas,
+            medicion.sql * 1000, medicion.plantillas * 1000,
+            ''.join(f"\n  {duracion * 1000:.1f} ms: {sql[:500]}" for duracion, sql in medicion.consultas_lentas),
+        )
+
+    muestra = (medicion.total * 1000, medicion.sql * 1000, medicion.consultas)
+    with _candado:
+        _pendientes.setdefault(vista, []).append(muestra)
+        if time.monotonic() - _ultimo_volcado < INTERVALO_VOLCADO:
+            return
+        _ultimo_volcado = time.monotonic()
+    volcar()
+
+
+def volcar():
+    """Mezcla las muestras acumuladas en este proceso con las de la caché."""
+    with _candado:
+        if not _pendientes:
+            return
+        nuevas = dict(_pendientes)
+        _pendientes.clear()
+    # Leer-modificar-escribir sin bloqueo: entre procesos se puede perder
+    # alguna muestra, lo que no altera los percentiles de forma apreciable
+    muestras = cache.get(CLAVE_CACHE) or {}
+    for vista, lista in nuevas.items():
+        muestras[vista] = (muestras.get(vista, []) + lista)[-MUESTRAS_POR_VISTA:]
+    cache.set(CLAVE_CACHE, muestras, None)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not valores:
+        return 0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def resumen_por_vista():
+    volcar()
+    filas = []
+    for vista, muestras in sorted((cache.get(CLAVE_CACHE) or {}).items()):
+        totales = sorted(m[0] for m in muestras)
+        sql = sorted(m[1] for m in muestras)
+        consultas = sorted(m[2] for m in muestras)
+        filas.append({
+            'vista': vista,
+            'peticiones': len(muestras),
+            'p50': percentil(totales, 50),
+            'p90': percentil(totales, 90),
+            'p99': percentil(totales, 99),
+            'sql_p50': percentil(sql, 50),
+            'sql_p90': percentil(sql, 90),
+            'consultas_p50': percentil(consultas, 50),
+            'consultas_max': consultas[-1],
+        })
+    # Primero las vistas más lentas
+    filas.sort(key=lambda f: f['p90'], reverse=True)
+    return filas
@@ -0,0 +1,303 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from io import StringIO
+from unittest import mock
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes import versiones
+from clientes.instrumentacion import percentil
+from clientes.models import AgenteVentas, Cliente, Direccion, ImportacionLog, Trabajo
+from clientes.trabajos import ejecutar, tomar_siguiente
+from clientes.versiones import marcar_cambio
+from gestion_clientes.base_datos import modo_journal
+
+
+def _consumir(respuesta):
+    """Lee el cuerpo completo, también en respuestas en streaming (Excel, FileResponse)."""
+    if respuesta.streaming:
+        for _ in respuesta.streaming_content:
+            pass
+    respuesta.close()
+
+
+def _procesar_cola():
+    """Ejecuta en este proceso lo que haría ``manage.py procesar_trabajos --una-vez``."""
+    while True:
+        trabajo = tomar_siguiente()
+        if trabajo is None:
+            return
+        trabajo = ejecutar(trabajo)
+        if trabajo.estado == Trabajo.FALLIDO:
+            raise CommandError(f"{trabajo}: {trabajo.error.strip().splitlines()[-1]}")
+
+
+def _invalidar():
+    """Deja las cachés frías: fragmentos, estadísticas, perfiles y archivos exportados."""
+    cache.clear()
+    marcar_cambio()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide lista, consulta, dashboard, exportaciones e importación sobre una base de prueba "
+        "con datos sintéticos de distintos tamaños y guarda los resultados en un informe JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000',
+                            help="Cantidades de clientes a generar, separadas por coma.")
+        parser.add_argument('--agentes', type=int, default=20)
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--filas-importacion', type=int, default=1000)
+        parser.add_argument('--sin-memoria', action='store_true',
+                            help="No mide el pico de memoria (tracemalloc vuelve todo varias veces más lento).")
+        parser.add_argument('--sin-concurrencia', action='store_true',
+                            help="No mide las lecturas durante una importación en curso.")
+        parser.add_argument('--salida', default='benchmark.json')
+
+    def handle(self, *args, **opciones):
+        try:
+            tamanos = [int(t) for t in opciones['tamanos'].split(',') if t.strip()]
+        except ValueError:
+            raise CommandError("--tamanos debe ser una lista de enteros, p. ej. 1000,10000")
+
+        temporal = tempfile.mkdtemp(prefix='benchmark_clientes_')
+        config_test = connection.settings_dict['TEST']
+        nombre_original = connection.settings_dict['NAME']
+        nombre_test_original = config_test.get('NAME')
+        # Base de prueba en disco (no en memoria), como en producción
+        if connection.vendor == 'sqlite':
+            config_test['NAME'] = os.path.join(temporal, 'benchmark.sqlite3')
+
+        setup_test_environment()
+        # Caché, archivos subidos y exportaciones aislados de los de la instalación
+        aislado = override_settings(
+            MEDIA_ROOT=temporal,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        resultados = []
+        try:
+            with aislado, mock.patch.object(versiones, 'CACHE_DIR', os.path.join(temporal, 'cache')):
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                journal = modo_journal(connection)
+                try:
+                    for tamano in tamanos:
+                        self.stdout.write(f"== {tamano} clientes ==")
+                        resultados.extend(self.medir_tamano(tamano, opciones, temporal))
+                finally:
+                    connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        finally:
+            teardown_test_environment()
+            config_test['NAME'] = nombre_test_original
+            shutil.rmtree(temporal, ignore_errors=True)
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_datos': connection.vendor,
+            'journal_mode': journal,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'repeticiones': opciones['repeticiones'],
+            'resultados': resultados,
+        }
+        with open(opciones['salida'], 'w', encoding='utf-8') as salida:
+            json.dump(informe, salida, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Informe guardado en {opciones['salida']}"))
+
+    def preparar_datos(self, tamano, opciones, temporal):
+        Direccion.objects.all().delete()
+        Cliente.objects.all().delete()
+        AgenteVentas.objects.all().delete()
+        Trabajo.objects.all().delete()
+        ImportacionLog.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        call_command('generar_datos', clientes=tamano, agentes=opciones['agentes'], stdout=StringIO())
+
+        supervisor = get_user_model().objects.create_user('benchmark_supervisor')
+        supervisor.groups.add(Group.objects.get_or_create(name='Supervisor')[0])
+        agente = AgenteVentas.objects.filter(user__isnull=False).select_related('user').first()
+
+        # Una planilla distinta por ejecución: la misma se rechazaría por hash repetido
+        # (repeticiones, la medición de memoria y la de concurrencia)
+        planillas = []
+        for i in range(opciones['repeticiones'] + 2):
+            ruta = os.path.join(temporal, f'planilla_{tamano}_{i}.xlsx')
+            call_command(
+                'generar_datos', clientes=0, agentes=0, planilla=ruta,
+                desde=tamano + i * opciones['filas_importacion'],
+                filas_planilla=opciones['filas_importacion'], stdout=StringIO(),
+            )
+            planillas.append(ruta)
+        return supervisor, agente.user if agente else None, planillas
+
+    def medir_tamano(self, tamano, opciones, temporal):
+        supervisor, usuario_agente, planillas = self.preparar_datos(tamano, opciones, temporal)
+
+        cliente_supervisor = Client()
+        cliente_supervisor.force_login(supervisor)
+        cliente_agente = Client()
+        if usuario_agente:
+            cliente_agente.force_login(usuario_agente)
+
+        def pedir(cliente, nombre, datos=None):
+            def funcion():
+                respuesta = cliente.get(reverse(nombre), datos or {})
+                if respuesta.status_code == 302 and nombre == 'exportar_clientes_pdf':
+                    # Sobre PDF_FILAS_SINCRONICAS el PDF se encola: se mide también el trabajo
+                    _procesar_cola()
+                elif respuesta.status_code != 200:
+                    raise CommandError(f"{nombre} respondió {respuesta.status_code}")
+                _consumir(respuesta)
+            return funcion
+
+        pendientes = iter(planillas)
+
+        def importar():
+            with open(next(pendientes), 'rb') as archivo:
+                respuesta = cliente_supervisor.post(reverse('importar_clientes'), {'archivo': archivo})
+            if respuesta.status_code != 302:
+                raise CommandError(f"importar_clientes respondió {respuesta.status_code}")
+            _procesar_cola()
+
+        escenarios = [
+            ('lista_clientes (supervisor)', pedir(cliente_supervisor, 'lista_clientes'), True),
+            ('consulta_clientes', pedir(cliente_supervisor, 'consulta_clientes', {'comuna': 'Santiago'}), True),
+            ('dashboard_supervisor', pedir(cliente_supervisor, 'dashboard_supervisor'), True),
+            ('exportar_clientes_excel', pedir(cliente_supervisor, 'exportar_clientes_excel'), True),
+            ('exportar_clientes_pdf', pedir(cliente_supervisor, 'exportar_clientes_pdf'), True),
+            ('importar_clientes', importar, False),
+        ]
+        if usuario_agente:
+            escenarios.insert(1, ('lista_clientes (agente)', pedir(cliente_agente, 'lista_clientes'), True))
+
+        resultados = []
+        for nombre, funcion, cacheable in escenarios:
+            resultado = {'tamano': tamano, 'escenario': nombre}
+
+            if cacheable:
+                _invalidar()
+                segundos, consultas, _ = self.medir(funcion)
+                resultado['frio'] = {'segundos': round(segundos, 4), 'consultas': consultas}
+
+            tiempos = []
+            for _ in range(opciones['repeticiones']):
+                segundos, consultas, _ = self.medir(funcion)
+                tiempos.append(segundos)
+            resultado.update({
+                'segundos': round(statistics.median(tiempos), 4),
+                'segundos_min': round(min(tiempos), 4),
+                'consultas': consultas,
+            })
+
+            if not opciones['sin_memoria']:
+                # Peor caso: la memoria se mide con las cachés frías
+                if cacheable:
+                    _invalidar()
+                _, _, pico = self.medir(funcion, memoria=True)
+                resultado['memoria_pico_kb'] = round(pico / 1024)
+
+            self.stdout.write(
+                f"  {nombre:<30} {resultado['segundos']:>8.3f}s  {resultado['consultas']:>4} consultas"
+                + (f"  (frío {resultado['frio']['segundos']:.3f}s, {resultado['frio']['consultas']} consultas)"
+                   if cacheable else '')
+                + (f"  {resultado['memoria_pico_kb']} KB" if 'memoria_pico_kb' in resultado else '')
+            )
+            resultados.append(resultado)
+
+        if not opciones['sin_concurrencia']:
+            lector = Client()
+            lector.force_login(supervisor)
+            resultado = self.medir_concurrencia(cliente_supervisor, lector, planillas[-1])
+            resultado['tamano'] = tamano
+            self.stdout.write(
+                f"  {resultado['escenario']:<30} p50 {resultado['p50']:.3f}s  p95 {resultado['p95']:.3f}s  "
+                f"{resultado['lecturas']} lecturas, {resultado['bloqueadas']} bloqueadas "
+                f"(importación {resultado['importacion_segundos']:.3f}s)"
+            )
+            resultados.append(resultado)
+        return resultados
+
+    def medir_concurrencia(self, cliente_importador, lector, planilla):
+        """
+        Latencia de ``consulta_clientes`` mientras otro hilo (con su propia
+        conexión) importa ``planilla``. Con journal WAL las lecturas no esperan
+        a que termine cada lote; sin WAL se bloquean o fallan con
+        "database is locked".
+        """
+        errores = []
+
+        def importar():
+            try:
+                with open(planilla, 'rb') as archivo:
+                    respuesta = cliente_importador.post(reverse('importar_clientes'), {'archivo': archivo})
+                if respuesta.status_code != 302:
+                    raise CommandError(f"importar_clientes respondió {respuesta.status_code}")
+                _procesar_cola()
+            except Exception as error:
+                errores.append(error)
+            finally:
+                connections.close_all()
+
+        latencias = []
+        bloqueadas = 0
+        hilo = threading.Thread(target=importar)
+        inicio = time.perf_counter()
+        hilo.start()
+        while hilo.is_alive():
+            antes = time.perf_counter()
+            try:
+                _consumir(lector.get(reverse('consulta_clientes'), {'comuna': 'Santiago'}))
+            except OperationalError:
+                bloqueadas += 1
+                continue
+            latencias.append(time.perf_counter() - antes)
+        hilo.join()
+        duracion = time.perf_counter() - inicio
+        if errores:
+            raise CommandError(f"La importación concurrente falló: {errores[0]}")
+
+        latencias.sort()
+        return {
+            'escenario': 'consulta durante importación',
+            'lecturas': len(latencias),
+            'bloqueadas': bloqueadas,
+            'p50': round(percentil(latencias, 50), 4),
+            'p95': round(percentil(latencias, 95), 4),
+            'max': round(latencias[-1], 4) if latencias else 0,
+            'importacion_segundos': round(duracion, 4),
+        }
+
+    def medir(self, funcion, memoria=False):
+        """Devuelve ``(segundos, consultas, pico_memoria_bytes)`` de una ejecución."""
+        if memoria:
+            tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                funcion()
+                segundos = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1] if memoria else None
+        finally:
+            if memoria:
+                tracemalloc.stop()
+        return segundos, len(capturadas), pico
@@ -0,0 +1,149 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook, load_workbook
+
+from clientes import busqueda
+from clientes.importacion import en_lotes
+from clientes.models import AgenteVentas, Cliente, Direccion, TipoDireccion, TipoEntidad
+from clientes.normalizacion import digito_verificador
+from clientes.versiones import marcar_cambio
+
+
+NOMBRES = ['Comercial', 'Inversiones', 'Constructora', 'Transportes', 'Servicios', 'Agrícola',
+           'Ferretería', 'Panadería', 'Distribuidora', 'Consultora', 'Pesquera', 'Librería']
+APELLIDOS = ['Pérez', 'González', 'Muñoz', 'Rojas', 'Díaz', 'Soto', 'Contreras', 'Silva',
+             'Martínez', 'Sepúlveda', 'Morales', 'Núñez', 'Araya', 'Carrasco', 'Órdenes']
+SUFIJOS = ['Ltda.', 'SpA', 'S.A.', 'EIRL', '']
+COMUNAS = [('Punta Arenas', 'Punta Arenas'), ('Natales', 'Puerto Natales'), ('Porvenir', 'Porvenir'),
+           ('Santiago', 'Santiago'), ('Ñuñoa', 'Santiago'), ('Providencia', 'Santiago'),
+           ('Valparaíso', 'Valparaíso'), ('Concepción', 'Concepción'), ('Temuco', 'Temuco')]
+CALLES = ['Bories', 'Errázuriz', 'Colón', 'Magallanes', "O'Higgins", 'Pedro Montt', 'Av. España',
+          'Balmaceda', 'Lautaro Navarro', 'Chiloé']
+
+TIPOS_ENTIDAD = ['Persona Natural', 'Empresa']
+
+
+def rut_sintetico(indice):
+    numero = 5_000_000 + indice
+    return f"{numero}-{digito_verificador(numero)}"
+
+
+def fila_planilla(azar, indice):
+    """Una fila con las columnas de plantilla_clientes.xlsx."""
+    nombre = f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(SUFIJOS)}".strip()
+    comuna, ciudad = azar.choice(COMUNAS)
+    return [
+        azar.choice(TIPOS_ENTIDAD), f"{nombre} {indice}", rut_sintetico(indice),
+        f"cliente{indice}@ejemplo.cl", f"+569{azar.randint(10000000, 99999999)}", '', '',
+        azar.choice(CALLES), str(azar.randint(1, 9999)), comuna, ciudad,
+        str(azar.randint(6200000, 6299999)), 'Chile', '',
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Genera agentes, clientes y direcciones sintéticos para pruebas de rendimiento "
+            "y, opcionalmente, una planilla de importación con el formato de plantilla_clientes.xlsx.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agentes', type=int, default=10)
+        parser.add_argument('--clientes', type=int, default=1000)
+        parser.add_argument('--direcciones', type=int, default=2,
+                            help="Máximo de direcciones por cliente (entre 1 y este valor).")
+        parser.add_argument('--desde', type=int, default=0,
+                            help="Índice inicial para RUT y correos (evita choques con datos previos).")
+        parser.add_argument('--planilla', help="Ruta del .xlsx de importación a generar.")
+        parser.add_argument('--filas-planilla', type=int, default=1000)
+        parser.add_argument('--semilla', type=int, default=1234)
+        parser.add_argument('--lote', type=int, default=2000)
+
+    def handle(self, *args, **opciones):
+        azar = random.Random(opciones['semilla'])
+        lote = opciones['lote']
+        desde = opciones['desde']
+
+        if opciones['clientes'] or opciones['agentes']:
+            self.generar_base(azar, opciones, lote, desde)
+
+        if opciones['planilla']:
+            # Índices posteriores a los clientes generados: la planilla se puede importar sin duplicados
+            inicio = desde + opciones['clientes']
+            self.generar_planilla(azar, opciones['planilla'], inicio, opciones['filas_planilla'])
+
+    def generar_base(self, azar, opciones, lote, desde):
+        tipos = [TipoEntidad.objects.get_or_create(nombre=n)[0] for n in TIPOS_ENTIDAD]
+        tipo_direccion, _ = TipoDireccion.objects.get_or_create(
+            nombre=getattr(settings, 'IMPORTACION_TIPO_DIRECCION', 'Principal')
+        )
+
+        User = get_user_model()
+        usuarios = User.objects.bulk_create([
+            User(username=f"agente_{desde + i}", email=f"agente{desde + i}@ejemplo.cl")
+            for i in range(opciones['agentes'])
+        ], batch_size=lote)
+        agentes = [
+            AgenteVentas(
+                user=usuario,
+                nombre=f"{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)} {desde + i}",
+                rut=rut_sintetico(9_000_000 + desde + i),
+                email=f"agente{desde + i}@ejemplo.cl",
+                telefono=f"+569{azar.randint(10000000, 99999999)}",
+            )
+            for i, usuario in enumerate(usuarios)
+        ]
+        for agente in agentes:
+            agente.actualizar_campos_normalizados()
+        agentes = AgenteVentas.objects.bulk_create(agentes, batch_size=lote)
+
+        creados = 0
+        for indices in en_lotes(range(desde, desde + opciones['clientes']), lote):
+            clientes = []
+            for indice in indices:
+                fila = fila_planilla(azar, indice)
+                cliente = Cliente(
+                    tipo_entidad=azar.choice(tipos),
+                    nombre_razon_social=fila[1], rut=fila[2], email=fila[3], telefono=fila[4],
+                    activo=azar.random() > 0.1,
+                    agente=azar.choice(agentes) if agentes and azar.random() > 0.05 else None,
+                )
+                cliente.actualizar_campos_normalizados()
+                clientes.append(cliente)
+            clientes = Cliente.objects.bulk_create(clientes, batch_size=lote)
+
+            direcciones = []
+            for cliente in clientes:
+                for _ in range(azar.randint(1, max(1, opciones['direcciones']))):
+                    comuna, ciudad = azar.choice(COMUNAS)
+                    direcciones.append(Direccion(
+                        cliente_id=cliente.pk, tipo=tipo_direccion,
+                        calle=azar.choice(CALLES), numero=str(azar.randint(1, 9999)),
+                        comuna=comuna, ciudad=ciudad, codigo_postal=str(azar.randint(6200000, 6299999)),
+                        pais='Chile',
+                    ))
+            Direccion.objects.bulk_create(direcciones, batch_size=lote)
+            busqueda.indexar([cliente.pk for cliente in clientes])
+            creados += len(clientes)
+
+        # bulk_create no envía señales: se invalidan versiones y cachés a mano
+        marcar_cambio()
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(agentes)} agentes y {creados} clientes generados."
+        ))
+
+    def generar_planilla(self, azar, ruta, inicio, filas):
+        plantilla = load_workbook(settings.BASE_DIR / 'clientes' / 'static' / 'plantillas' / 'plantilla_clientes.xlsx',
+                                  read_only=True)
+        encabezados = next(plantilla.active.iter_rows(max_row=1, values_only=True))
+        plantilla.close()
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Hoja1")
+        ws.append(list(encabezados))
+        for indice in range(inicio, inicio + filas):
+            ws.append(fila_planilla(azar, indice))
+        wb.save(ruta)
+        self.stdout.write(self.style.SUCCESS(f"Planilla con {filas} filas generada en {ruta}."))
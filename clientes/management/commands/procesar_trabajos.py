@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clientes.trabajos import ejecutar, recuperar_abandonados, tomar_siguiente
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de trabajos en segundo plano (importaciones de clientes, etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help="Procesa los trabajos pendientes y termina, en vez de quedar esperando.",
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help="Segundos de espera entre revisiones cuando la cola está vacía.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                trabajo = tomar_siguiente()
+                if trabajo is None:
+                    # Con la cola vacía se revisan trabajos de workers caídos
+                    if recuperar_abandonados():
+                        continue
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                self.stdout.write(f"Procesando {trabajo}...")
+                trabajo = ejecutar(trabajo)
+                if trabajo.estado == trabajo.FALLIDO:
+                    self.stderr.write(self.style.ERROR(f"{trabajo}: {trabajo.error.strip().splitlines()[-1]}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{trabajo} terminado."))
+        except KeyboardInterrupt:
+            self.stdout.write("Worker detenido.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clientes.busqueda import reconstruir, usa_fts5
+
+
+class Command(BaseCommand):
+    help = "Rehace el índice de búsqueda de texto completo de clientes y direcciones."
+
+    def handle(self, *args, **options):
+        indice = "FTS5" if usa_fts5() else "TerminoBusqueda"
+        with transaction.atomic():
+            total = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{total} clientes indexados ({indice})."))
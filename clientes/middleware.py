@@ -0,0 +1,124 @@
+"""
+Middleware propios de la app clientes.
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import cached_property
+
+from . import instrumentacion
+from .models import AgenteVentas, Cliente
+
+
+PERFIL_CACHE_TTL = getattr(settings, 'PERFIL_CACHE_TTL', 300)
+
+
+def _clave_perfil(user_id):
+    return f'clientes:perfil:{user_id}'
+
+
+def invalidar_perfil(user_id):
+    if user_id is not None:
+        cache.delete(_clave_perfil(user_id))
+
+
+class PerfilUsuario:
+    """
+    Rol y agente de ventas del usuario de la petición.
+
+    Se resuelve de forma perezosa la primera vez que se consulta y se guarda
+    en la caché por usuario; las señales de ``clientes/signals.py`` la
+    invalidan cuando cambian sus grupos o su ``AgenteVentas``.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def _datos(self):
+        if not self.user.is_authenticated:
+            return False, None
+        datos = cache.get(_clave_perfil(self.user.pk))
+        if datos is None:
+            es_supervisor = self.user.groups.filter(name='Supervisor').exists()
+            agente = AgenteVentas.objects.filter(user=self.user).first()
+            datos = (es_supervisor, agente)
+            cache.set(_clave_perfil(self.user.pk), datos, PERFIL_CACHE_TTL)
+        return datos
+
+    @property
+    def es_supervisor(self):
+        return self._datos[0]
+
+    @property
+    def agente(self):
+        return self._datos[1]
+
+    def clientes_visibles(self):
+        """Supervisores ven todos los clientes; agentes, solo los suyos."""
+        if self.es_supervisor:
+            return Cliente.objects.all()
+        if self.agente is not None:
+            return Cliente.objects.filter(agente=self.agente)
+        return Cliente.objects.none()
+
+    def puede_gestionar(self, cliente):
+        """Supervisor o agente asignado al cliente."""
+        if self.es_supervisor:
+            return True
+        return self.agente is not None and cliente.agente_id == self.agente.pk
+
+
+class PerfilUsuarioMiddleware:
+    """
+    Deja en ``request.perfil`` el rol y el agente del usuario, para que las
+    vistas no repitan las consultas en cada chequeo de permisos.
+    Debe ir después de ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.perfil = PerfilUsuario(request.user)
+        return self.get_response(request)
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide consultas, tiempo SQL, render de plantillas y tiempo total de cada
+    petición; los envía en la cabecera ``Server-Timing``, deja en el log las
+    peticiones que superan ``INSTRUMENTACION_UMBRAL_MS`` /
+    ``INSTRUMENTACION_UMBRAL_CONSULTAS`` y acumula los tiempos por vista para
+    la página de rendimiento. Opcional: se activa con
+    ``INSTRUMENTACION_ACTIVA = True`` y conviene ponerlo primero en la lista.
+
+    En respuestas en streaming (exportación a Excel) el total no incluye el
+    envío del cuerpo.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION_ACTIVA', False):
+            raise MiddlewareNotUsed
+        instrumentacion.instrumentar_plantillas()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion, token = instrumentacion.iniciar()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion.medir_sql))
+                response = self.get_response(request)
+        finally:
+            instrumentacion.finalizar(token)
+        medicion.terminar()
+
+        response['Server-Timing'] = medicion.server_timing()
+        coincidencia = request.resolver_match
+        if coincidencia is not None:
+            instrumentacion.registrar(request, coincidencia.view_name, medicion)
+        return response
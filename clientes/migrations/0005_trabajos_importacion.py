@@ -0,0 +1,57 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:28
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def marcar_importaciones_previas(apps, schema_editor):
+    # Las importaciones anteriores se procesaban dentro de la petición: ya terminaron
+    ImportacionLog = apps.get_model('clientes', 'ImportacionLog')
+    ImportacionLog.objects.update(
+        estado='terminado',
+        total_filas=F('exitosos') + F('fallidos'),
+        procesadas=F('exitosos') + F('fallidos'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_tipoentidad_remove_cliente_tipo_persona_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacionlog',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('terminado', 'Terminado'), ('fallido', 'Fallido')], default='pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importacionlog',
+            name='procesadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importacionlog',
+            name='total_filas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('importacion', 'Importación de clientes')], max_length=30)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('terminado', 'Terminado'), ('fallido', 'Fallido')], db_index=True, default='pendiente', max_length=20)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('importacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trabajos', to='clientes.importacionlog')),
+            ],
+            options={
+                'ordering': ['creado'],
+            },
+        ),
+        migrations.RunPython(marcar_importaciones_previas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:31
+
+from django.db import migrations, models
+
+from clientes.normalizacion import normalizar_texto
+
+
+def poblar_nombre_normalizado(apps, schema_editor):
+    Cliente = apps.get_model('clientes', 'Cliente')
+    ultimo = 0
+    while True:
+        lote = list(
+            Cliente.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'nombre_razon_social')[:2000]
+        )
+        if not lote:
+            break
+        for cliente in lote:
+            cliente.nombre_normalizado = normalizar_texto(cliente.nombre_razon_social)
+        Cliente.objects.bulk_update(lote, ['nombre_normalizado'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_trabajos_importacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='direccion',
+            name='ciudad',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Ciudad'),
+        ),
+        migrations.AlterField(
+            model_name='direccion',
+            name='comuna',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Comuna'),
+        ),
+        migrations.RunPython(poblar_nombre_normalizado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clientes', '0006_indices_consulta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajo',
+            name='resultado',
+            field=models.FileField(blank=True, upload_to='exportaciones/'),
+        ),
+        migrations.AddField(
+            model_name='trabajo',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='trabajo',
+            name='tipo',
+            field=models.CharField(choices=[('importacion', 'Importación de clientes'), ('exportacion_pdf', 'Exportación de clientes a PDF')], max_length=30),
+        ),
+    ]
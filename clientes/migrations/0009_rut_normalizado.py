@@ -0,0 +1,50 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+from clientes.normalizacion import normalizar_rut
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    """
+    RUT inválidos quedan en NULL. Si dos registros escriben el mismo RUT de
+    distinta forma, solo el más antiguo recibe la forma canónica; los demás
+    quedan en NULL para revisarlos a mano.
+    """
+    for modelo in ('AgenteVentas', 'Cliente'):
+        Modelo = apps.get_model('clientes', modelo)
+        vistos = set()
+        ultimo = 0
+        while True:
+            lote = list(Modelo.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'rut')[:2000])
+            if not lote:
+                break
+            for registro in lote:
+                canonico = normalizar_rut(registro.rut)
+                if canonico in vistos:
+                    canonico = None
+                registro.rut_normalizado = canonico
+                vistos.add(canonico)
+            Modelo.objects.bulk_update(lote, ['rut_normalizado'])
+            ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0008_version_datos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenteventas',
+            name='rut_normalizado',
+            field=models.CharField(editable=False, max_length=12, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='rut_normalizado',
+            field=models.CharField(editable=False, max_length=12, null=True, unique=True),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from clientes.normalizacion import clave_nombre, normalizar_telefono
+
+
+def poblar_claves(apps, schema_editor):
+    Cliente = apps.get_model('clientes', 'Cliente')
+    ultimo = 0
+    while True:
+        lote = list(
+            Cliente.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'nombre_razon_social', 'telefono')[:2000]
+        )
+        if not lote:
+            break
+        for cliente in lote:
+            cliente.clave_nombre = clave_nombre(cliente.nombre_razon_social)
+            cliente.telefono_normalizado = normalizar_telefono(cliente.telefono)
+        Cliente.objects.bulk_update(lote, ['clave_nombre', 'telefono_normalizado'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0009_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='clave_nombre',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefono_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=8),
+        ),
+        migrations.CreateModel(
+            name='CandidatoDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fila', models.PositiveIntegerField()),
+                ('motivos', models.CharField(max_length=100)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clientes.cliente')),
+                ('importacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidatos', to='clientes.importacionlog')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Posible duplicado',
+                'verbose_name_plural': 'Posibles duplicados',
+            },
+        ),
+        migrations.RunPython(poblar_claves, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0010_candidatos_duplicados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacionlog',
+            name='actualizado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importacionlog',
+            name='ultima_fila',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
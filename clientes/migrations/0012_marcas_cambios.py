@@ -0,0 +1,55 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0011_punto_control_importacion'),
+    ]
+
+    operations = [
+        # Las filas existentes quedan con la fecha de la migración
+        migrations.AddField(
+            model_name='cliente',
+            name='creado',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Creado'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Modificado'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='direccion',
+            name='creado',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Creado'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='direccion',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Modificado'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('cliente', 'Cliente'), ('direccion', 'Dirección')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('cliente_id', models.BigIntegerField()),
+                ('agente_id', models.BigIntegerField(blank=True, null=True)),
+                ('eliminado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Eliminación',
+                'verbose_name_plural': 'Eliminaciones',
+                'indexes': [models.Index(fields=['modelo', 'eliminado'], name='clientes_eliminacion_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.1 on 2026-10-17 23:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from clientes.busqueda import TABLA_FTS, crear_tabla_fts, reconstruir
+
+
+def crear_indice(apps, schema_editor):
+    # Tabla FTS5 solo en SQLite; en otros motores se llena TerminoBusqueda
+    crear_tabla_fts(schema_editor)
+    modelos = (apps.get_model('clientes', 'Cliente'), apps.get_model('clientes', 'Direccion'),
+               apps.get_model('clientes', 'TerminoBusqueda'))
+    reconstruir(modelos, vaciar=False)
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0012_marcas_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=100)),
+                ('peso', models.PositiveSmallIntegerField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clientes.cliente')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='terminobusqueda',
+            index=models.Index(fields=['termino', 'cliente'], name='clientes_termino_idx'),
+        ),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
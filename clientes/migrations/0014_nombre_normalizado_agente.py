@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+from clientes.normalizacion import normalizar_texto
+
+
+def poblar_nombre_normalizado(apps, schema_editor):
+    AgenteVentas = apps.get_model('clientes', 'AgenteVentas')
+    ultimo = 0
+    while True:
+        lote = list(AgenteVentas.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'nombre')[:2000])
+        if not lote:
+            break
+        for agente in lote:
+            agente.nombre_normalizado = normalizar_texto(agente.nombre)
+        AgenteVentas.objects.bulk_update(lote, ['nombre_normalizado'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0013_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenteventas',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(poblar_nombre_normalizado, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .normalizacion import clave_nombre, normalizar_rut, normalizar_telefono, normalizar_texto
+
 ### Importar planilla de clientes #### 
 from django.contrib.auth import get_user_model
 
@@ -9,6 +13,49 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+def _validar_rut(instancia):
+    """Para ``clean()``: RUT con dígito verificador correcto y no repetido en su forma canónica."""
+    canonico = normalizar_rut(instancia.rut)
+    if canonico is None:
+        raise ValidationError({'rut': _("RUT inválido: revisa el dígito verificador.")})
+    repetido = type(instancia).objects.filter(rut_normalizado=canonico).exclude(pk=instancia.pk)
+    if repetido.exists():
+        raise ValidationError({'rut': _("Ya existe un registro con este RUT.")})
+
+
+def _rut_normalizado(instancia):
+    """
+    Forma canónica a guardar en ``rut_normalizado``. Un registro que la
+    migración 0009 dejó en NULL por repetir el RUT de otro sigue en NULL al
+    guardarlo con ``save()`` (en vez de fallar por la restricción única);
+    se corrige desde el formulario, cuyo ``clean()`` informa el duplicado.
+    """
+    canonico = normalizar_rut(instancia.rut)
+    if canonico and instancia.pk is not None and instancia.rut_normalizado is None:
+        repetido = type(instancia).objects.filter(rut_normalizado=canonico).exclude(pk=instancia.pk)
+        if repetido.exists():
+            return None
+    return canonico
+
+
+def _campos_a_guardar(update_fields, derivados):
+    """Agrega a ``update_fields`` los campos derivados de los que se están guardando."""
+    if update_fields is None:
+        return None
+    update_fields = set(update_fields)
+    for origen, derivado in derivados:
+        if origen in update_fields:
+            update_fields.add(derivado)
+    return update_fields
+
+
+def _con_modificado(update_fields):
+    # auto_now solo se escribe si 'modificado' va en update_fields
+    if update_fields is None:
+        return None
+    return set(update_fields) | {'modificado'}
+
+
 class AgenteVentas(models.Model):
     # Nueva relación uno a uno con User
     user = models.OneToOneField(
@@ -24,10 +71,30 @@ class AgenteVentas(models.Model):
     rut = models.CharField(max_length=20, unique=True, verbose_name=_("Rut"))
     email = models.EmailField(unique=True, verbose_name=_("Correo Electrónico"))
     telefono = models.CharField(max_length=15, verbose_name=_("Teléfono"))
+    # RUT canónico ("12345678-9"); NULL si el RUT ingresado no es válido
+    rut_normalizado = models.CharField(max_length=12, unique=True, null=True, editable=False)
+    # Nombre en minúsculas y sin tildes, para el autocompletado por prefijo con índice
+    nombre_normalizado = models.CharField(max_length=100, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return self.nombre
 
+    def actualizar_campos_normalizados(self):
+        self.rut_normalizado = _rut_normalizado(self)
+        self.nombre_normalizado = normalizar_texto(self.nombre)
+
+    def clean(self):
+        super().clean()
+        _validar_rut(self)
+
+    def save(self, *args, **kwargs):
+        self.actualizar_campos_normalizados()
+        kwargs['update_fields'] = _campos_a_guardar(kwargs.get('update_fields'), [
+            ('rut', 'rut_normalizado'),
+            ('nombre', 'nombre_normalizado'),
+        ])
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Agente de ventas"
         verbose_name_plural = "Agentes de ventas"
@@ -49,10 +116,41 @@ class Cliente(models.Model):
     activo = models.BooleanField(default=True, verbose_name=_("Activo"))
     observacion = models.TextField(blank=True, verbose_name=_("Observación"))
     agente = models.ForeignKey(AgenteVentas, on_delete=models.SET_NULL, null=True, blank=True)
+    # Nombre en minúsculas y sin tildes, para búsquedas por prefijo con índice
+    nombre_normalizado = models.CharField(max_length=200, blank=True, editable=False, db_index=True)
+    # RUT canónico ("12345678-9"): búsquedas y control de duplicados sin importar puntos ni guion
+    rut_normalizado = models.CharField(max_length=12, unique=True, null=True, editable=False)
+    # Claves de bloqueo para detectar posibles duplicados (ver duplicados.py)
+    clave_nombre = models.CharField(max_length=200, blank=True, editable=False, db_index=True)
+    telefono_normalizado = models.CharField(max_length=8, blank=True, editable=False, db_index=True)
+    # Marcas para la sincronización incremental (ver cambios.py)
+    creado = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Creado"))
+    modificado = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_("Modificado"))
 
     def __str__(self):
         return self.nombre_razon_social
 
+    def actualizar_campos_normalizados(self):
+        self.nombre_normalizado = normalizar_texto(self.nombre_razon_social)
+        self.rut_normalizado = _rut_normalizado(self)
+        self.clave_nombre = clave_nombre(self.nombre_razon_social)
+        self.telefono_normalizado = normalizar_telefono(self.telefono)
+
+    def clean(self):
+        super().clean()
+        _validar_rut(self)
+
+    def save(self, *args, **kwargs):
+        self.actualizar_campos_normalizados()
+        kwargs['update_fields'] = _campos_a_guardar(kwargs.get('update_fields'), [
+            ('nombre_razon_social', 'nombre_normalizado'),
+            ('nombre_razon_social', 'clave_nombre'),
+            ('rut', 'rut_normalizado'),
+            ('telefono', 'telefono_normalizado'),
+        ])
+        kwargs['update_fields'] = _con_modificado(kwargs['update_fields'])
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
@@ -75,14 +173,20 @@ class Direccion(models.Model):
     tipo = models.ForeignKey('TipoDireccion', on_delete=models.PROTECT, verbose_name=_("Tipo de Dirección"))
     calle = models.CharField(max_length=100, verbose_name=_("Calle"))
     numero = models.CharField(max_length=20, verbose_name=_("Número"))
-    comuna = models.CharField(max_length=100, verbose_name=_("Comuna"))
-    ciudad = models.CharField(max_length=100, verbose_name=_("Ciudad"))
+    comuna = models.CharField(max_length=100, db_index=True, verbose_name=_("Comuna"))
+    ciudad = models.CharField(max_length=100, db_index=True, verbose_name=_("Ciudad"))
     codigo_postal = models.CharField(max_length=20, blank=True, verbose_name=_("Código Potal"))
     pais = models.CharField(max_length=100, verbose_name=_("País"))
     observacion = models.TextField(blank=True, verbose_name=_("Observación"))
+    creado = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Creado"))
+    modificado = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_("Modificado"))
 
     def __str__(self):
         return f"{self.tipo} - {self.calle} {self.numero}, {self.comuna}"
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = _con_modificado(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name =_("Dirección")
@@ -93,6 +197,17 @@ class Direccion(models.Model):
 # Modelo para rastrear cada carga en la Importación
 #=================================================
 class ImportacionLog(models.Model):
+    PENDIENTE  = 'pendiente'
+    EN_PROCESO = 'en_proceso'
+    TERMINADO  = 'terminado'
+    FALLIDO    = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, _("Pendiente")),
+        (EN_PROCESO, _("En proceso")),
+        (TERMINADO, _("Terminado")),
+        (FALLIDO, _("Fallido")),
+    ]
+
     archivo       = models.FileField(upload_to='importaciones/')
     fecha         = models.DateTimeField(auto_now_add=True)
     usuario       = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
@@ -100,10 +215,148 @@ class ImportacionLog(models.Model):
     fallidos      = models.PositiveIntegerField(default=0)
     errores       = models.TextField(blank=True)   # JSON o texto plano con detalle por fila
     hash_archivo  = models.CharField(max_length=64, unique=True)
+    estado        = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    total_filas   = models.PositiveIntegerField(default=0)
+    procesadas    = models.PositiveIntegerField(default=0)
+    # Punto de control: última fila de la planilla ya confirmada y hora del último avance
+    ultima_fila   = models.PositiveIntegerField(default=0)
+    actualizado   = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.archivo.name} @ {self.fecha:%Y-%m-%d %H:%M}"
 
+    @property
+    def porcentaje(self):
+        if not self.total_filas:
+            return 100 if self.estado == self.TERMINADO else 0
+        return min(100, round(self.procesadas * 100 / self.total_filas))
+
     class Meta:
         ordering = ['-fecha']
 
+
+#=================================================
+# Posibles duplicados detectados al importar
+# (cliente importado vs. otro ya existente o de la misma planilla)
+#=================================================
+class CandidatoDuplicado(models.Model):
+    NOMBRE = 'nombre'
+    EMAIL = 'email'
+    DOMINIO_TELEFONO = 'dominio_telefono'
+    MOTIVOS = {
+        NOMBRE: _("Mismo nombre o razón social"),
+        EMAIL: _("Mismo correo"),
+        DOMINIO_TELEFONO: _("Mismo dominio de correo y teléfono"),
+    }
+
+    importacion = models.ForeignKey(ImportacionLog, on_delete=models.CASCADE, related_name='candidatos')
+    fila        = models.PositiveIntegerField()
+    cliente     = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    similar     = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    motivos     = models.CharField(max_length=100)   # separados por coma
+    creado      = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.cliente} ~ {self.similar} ({self.motivos})"
+
+    def motivos_display(self):
+        return [self.MOTIVOS.get(m, m) for m in self.motivos.split(',')]
+
+    class Meta:
+        verbose_name = _("Posible duplicado")
+        verbose_name_plural = _("Posibles duplicados")
+
+
+#=================================================
+# Índice invertido para la búsqueda de texto completo en motores sin
+# FTS5 (en SQLite se usa la tabla virtual clientes_busqueda; ver busqueda.py)
+#=================================================
+class TerminoBusqueda(models.Model):
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    termino = models.CharField(max_length=100)
+    peso    = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.termino} ({self.cliente_id})"
+
+    class Meta:
+        indexes = [models.Index(fields=['termino', 'cliente'], name='clientes_termino_idx')]
+
+
+#=================================================
+# Registro de clientes y direcciones eliminados, para que la
+# sincronización incremental (cambios.py) pueda informar los borrados.
+#=================================================
+class Eliminacion(models.Model):
+    CLIENTE = 'cliente'
+    DIRECCION = 'direccion'
+    MODELOS = [
+        (CLIENTE, _("Cliente")),
+        (DIRECCION, _("Dirección")),
+    ]
+
+    modelo     = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id  = models.BigIntegerField()
+    # Sin FK: el cliente ya no existe o puede dejar de existir
+    cliente_id = models.BigIntegerField()
+    # Agente del cliente eliminado, para el alcance de cada agente
+    agente_id  = models.BigIntegerField(null=True, blank=True)
+    eliminado  = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_modelo_display()} #{self.objeto_id} @ {self.eliminado:%Y-%m-%d %H:%M:%S}"
+
+    class Meta:
+        verbose_name = _("Eliminación")
+        verbose_name_plural = _("Eliminaciones")
+        indexes = [models.Index(fields=['modelo', 'eliminado'], name='clientes_eliminacion_idx')]
+
+
+#=================================================
+# Cola de trabajos en segundo plano (sin broker externo).
+# Los procesa el comando `manage.py procesar_trabajos`.
+#=================================================
+class Trabajo(models.Model):
+    PENDIENTE  = ImportacionLog.PENDIENTE
+    EN_PROCESO = ImportacionLog.EN_PROCESO
+    TERMINADO  = ImportacionLog.TERMINADO
+    FALLIDO    = ImportacionLog.FALLIDO
+
+    IMPORTACION = 'importacion'
+    EXPORTACION_PDF = 'exportacion_pdf'
+    TIPOS = [
+        (IMPORTACION, _("Importación de clientes")),
+        (EXPORTACION_PDF, _("Exportación de clientes a PDF")),
+    ]
+
+    tipo        = models.CharField(max_length=30, choices=TIPOS)
+    estado      = models.CharField(max_length=20, choices=ImportacionLog.ESTADOS,
+                                   default=PENDIENTE, db_index=True)
+    importacion = models.ForeignKey(ImportacionLog, on_delete=models.CASCADE, null=True, blank=True,
+                                    related_name='trabajos')
+    usuario     = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    resultado   = models.FileField(upload_to='exportaciones/', blank=True)
+    creado      = models.DateTimeField(auto_now_add=True)
+    iniciado    = models.DateTimeField(null=True, blank=True)
+    terminado   = models.DateTimeField(null=True, blank=True)
+    error       = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.estado})"
+
+    class Meta:
+        ordering = ['creado']
+
+
+
+#=================================================
+# Versión de los datos de clientes/direcciones (fila única).
+# Se incrementa en cada cambio; la usan ETag/Last-Modified y la
+# caché de exportaciones (ver clientes/versiones.py).
+#=================================================
+class VersionDatos(models.Model):
+    version    = models.PositiveBigIntegerField(default=1)
+    modificado = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"v{self.version} @ {self.modificado:%Y-%m-%d %H:%M:%S}"
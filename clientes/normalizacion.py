@@ -0,0 +1,80 @@
+"""
+Normalización de textos y RUT para búsquedas y comparaciones.
+"""
+import re
+import unicodedata
+
+from django.db.models import Q
+
+
+def normalizar_texto(valor):
+    """
+    Minúsculas, sin tildes ni espacios repetidos:
+    ``"  Comercial  Ñuñoa LTDA. "`` -> ``"comercial nunoa ltda."``.
+    """
+    if not valor:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', str(valor))
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.lower().split())
+
+
+def filtro_prefijo(campo, prefijo):
+    """
+    ``Q`` equivalente a ``campo__startswith=prefijo`` pero expresado como
+    rango (``>= prefijo`` y ``< prefijo + U+10FFFF``), que sí aprovecha el
+    índice B-tree en SQLite y PostgreSQL.
+    """
+    return Q(**{f'{campo}__gte': prefijo, f'{campo}__lt': prefijo + '\U0010ffff'})
+
+
+def digito_verificador(numero):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT."""
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {10: 'K', 11: '0'}.get(resto, str(resto))
+
+
+_CARACTERES_RUT = re.compile(r'[^0-9K]')
+
+
+def normalizar_rut(valor):
+    """
+    Forma canónica ``"12345678-9"`` (sin puntos, K mayúscula) de un RUT
+    escrito como ``"12.345.678-9"``, ``"12345678-9"`` o ``"123456789"``.
+    Devuelve ``None`` si no tiene forma de RUT o el dígito verificador no calza.
+    """
+    if valor is None:
+        return None
+    limpio = _CARACTERES_RUT.sub('', str(valor).upper())
+    cuerpo, dv = limpio[:-1].lstrip('0'), limpio[-1:]
+    if not cuerpo.isdigit() or len(cuerpo) > 9:
+        return None
+    if digito_verificador(cuerpo) != dv:
+        return None
+    return f'{cuerpo}-{dv}'
+
+
+# Formas societarias y palabras vacías que no distinguen a un cliente de otro
+PALABRAS_IGNORADAS = {
+    'ltda', 'limitada', 'spa', 'sa', 's', 'a', 'eirl', 'cia', 'y', 'de', 'del', 'la', 'las', 'los', 'el',
+}
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def clave_nombre(valor):
+    """
+    Clave de bloqueo para detectar nombres casi iguales: tokens normalizados,
+    sin forma societaria y ordenados. ``"Comercial Pérez y Cía. LTDA"`` y
+    ``"PEREZ COMERCIAL"`` dan ``"comercial perez"``.
+    """
+    tokens = _NO_ALFANUMERICO.sub(' ', normalizar_texto(valor)).split()
+    return ' '.join(sorted({t for t in tokens if t not in PALABRAS_IGNORADAS}))
+
+
+def normalizar_telefono(valor):
+    """Últimos 8 dígitos: ignora +56, el 9 de celular y los separadores."""
+    return ''.join(c for c in str(valor or '') if c.isdigit())[-8:]
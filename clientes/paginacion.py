@@ -0,0 +1,138 @@
+"""
+Paginación por cursor (keyset) sobre la clave primaria.
+
+En vez de ``OFFSET`` se filtra por ``pk > cursor`` (o ``pk < cursor`` para
+retroceder) y se piden ``tamano + 1`` filas para saber si hay otra página:
+cada página cuesta una sola consulta indexada, sin importar en qué parte
+de la tabla esté.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+POR_PAGINA = getattr(settings, 'CLIENTES_POR_PAGINA', 50)
+POR_PAGINA_MAXIMO = getattr(settings, 'CLIENTES_POR_PAGINA_MAXIMO', 200)
+# Sobre este número de filas estimadas el admin no hace COUNT(*) exacto
+UMBRAL_CONTEO_ESTIMADO = getattr(settings, 'ADMIN_UMBRAL_CONTEO_ESTIMADO', 10000)
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _pk(objeto):
+    # Las consultas con values() entregan diccionarios (ver api.py)
+    return objeto['id'] if isinstance(objeto, dict) else objeto.pk
+
+
+def tamano_pagina(params):
+    """Tamaño pedido en ``?por_pagina=``, acotado a ``POR_PAGINA_MAXIMO``."""
+    tamano = _entero(params.get('por_pagina'))
+    if not tamano or tamano < 1:
+        return POR_PAGINA
+    return min(tamano, POR_PAGINA_MAXIMO)
+
+
+class PaginaKeyset:
+    def __init__(self, objetos, params, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    def _query(self, **cursor):
+        params = self._params.copy()
+        params.pop('despues', None)
+        params.pop('antes', None)
+        params.update(cursor)
+        return params.urlencode()
+
+    @property
+    def query_siguiente(self):
+        return self._query(despues=self.siguiente) if self.siguiente is not None else ''
+
+    @property
+    def query_anterior(self):
+        return self._query(antes=self.anterior) if self.anterior is not None else ''
+
+
+def paginar_keyset(queryset, params, tamano=None):
+    """
+    Devuelve la página indicada por ``?despues=<pk>`` o ``?antes=<pk>``
+    (la primera si no viene ninguno). ``params`` es normalmente ``request.GET``.
+    ``queryset`` puede ser de modelos o de ``values()`` que incluya ``id``.
+    """
+    tamano = tamano or tamano_pagina(params)
+    despues = _entero(params.get('despues'))
+    antes = _entero(params.get('antes'))
+
+    if antes is not None:
+        objetos = list(queryset.filter(pk__lt=antes).order_by('-pk')[:tamano + 1])
+        hay_anterior = len(objetos) > tamano
+        objetos = objetos[:tamano][::-1]
+        hay_siguiente = True
+    else:
+        if despues is not None:
+            queryset = queryset.filter(pk__gt=despues)
+        objetos = list(queryset.order_by('pk')[:tamano + 1])
+        hay_siguiente = len(objetos) > tamano
+        objetos = objetos[:tamano]
+        hay_anterior = despues is not None
+
+    if not objetos:
+        return PaginaKeyset(objetos, params)
+    return PaginaKeyset(
+        objetos,
+        params,
+        siguiente=_pk(objetos[-1]) if hay_siguiente else None,
+        anterior=_pk(objetos[0]) if hay_anterior else None,
+    )
+
+
+#====================================
+# Paginador con conteo estimado (admin)
+#====================================
+def conteo_estimado(modelo):
+    """
+    Filas aproximadas de la tabla de ``modelo`` sin recorrerla: las
+    estadísticas del planificador en PostgreSQL y el mayor id en los demás
+    motores (cuenta también los ids borrados, pero es una sola lectura del
+    índice de la clave primaria). ``None`` si no hay estimación.
+    """
+    conexion = connections[modelo.objects.db]
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [modelo._meta.db_table])
+            fila = cursor.fetchone()
+        # reltuples es -1 (o 0) si la tabla nunca se analizó
+        return fila[0] if fila and fila[0] > 0 else None
+    return modelo.objects.aggregate(maximo=Max('pk'))['maximo']
+
+
+class PaginadorEstimado(Paginator):
+    """
+    ``Paginator`` que, para el listado sin filtros de una tabla grande, usa
+    ``conteo_estimado`` en vez de ``COUNT(*)``. Con filtros o búsqueda el
+    conteo es exacto (y acotado por el filtro).
+    """
+
+    @cached_property
+    def count(self):
+        consulta = getattr(self.object_list, 'query', None)
+        if consulta is not None and not consulta.where:
+            estimado = conteo_estimado(self.object_list.model)
+            if estimado is not None and estimado > UMBRAL_CONTEO_ESTIMADO:
+                return estimado
+        return super().count
@@ -0,0 +1,147 @@
+"""
+Receptores de señales que mantienen las cachés al día y registran los
+borrados para la sincronización incremental y el índice de búsqueda.
+Se conectan al importar este módulo desde ``ClientesConfig.ready()``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import autocompletar, busqueda
+from .cambios import registrar_eliminacion, registrar_reasignaciones
+from .estadisticas import invalidar_estadisticas
+from .fragmentos import GLOBAL, TODOS, invalidar_lista
+from .middleware import invalidar_perfil
+from .models import AgenteVentas, Cliente, Direccion, ImportacionLog, TipoDireccion, TipoEntidad
+from .versiones import marcar_cambio
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=AgenteVentas)
+@receiver(post_delete, sender=AgenteVentas)
+@receiver(post_save, sender=ImportacionLog)
+@receiver(post_delete, sender=ImportacionLog)
+def estadisticas_modificadas(sender, **kwargs):
+    invalidar_estadisticas()
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+@receiver(post_save, sender=AgenteVentas)
+@receiver(post_delete, sender=AgenteVentas)
+def datos_modificados(sender, **kwargs):
+    # Nueva versión de datos: invalida ETags y exportaciones cacheadas
+    marcar_cambio()
+
+
+#====================================
+# Perfil por usuario (PerfilUsuarioMiddleware)
+#====================================
+@receiver(post_save, sender=AgenteVentas)
+@receiver(post_delete, sender=AgenteVentas)
+def agente_modificado(sender, instance, **kwargs):
+    invalidar_perfil(instance.user_id)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def grupos_modificados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidar_perfil(instance.pk)
+    else:
+        # Cambio hecho desde el grupo: afecta a los usuarios de pk_set
+        # (en un clear() pk_set viene vacío y rige el TTL)
+        for user_id in pk_set or ():
+            invalidar_perfil(user_id)
+
+
+#====================================
+# Filas cacheadas de lista_clientes (clientes/fragmentos.py)
+#====================================
+@receiver(pre_save, sender=Cliente)
+def recordar_agente_anterior(sender, instance, **kwargs):
+    # Si el cliente cambia de agente también hay que invalidar la lista del agente anterior
+    instance._agente_anterior_id = None
+    if instance.pk:
+        instance._agente_anterior_id = (
+            Cliente.objects.filter(pk=instance.pk).values_list('agente_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def cliente_modificado(sender, instance, **kwargs):
+    invalidar_lista(TODOS, instance.agente_id, getattr(instance, '_agente_anterior_id', None))
+
+
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+def direccion_modificada(sender, instance, **kwargs):
+    agente_id = Cliente.objects.filter(pk=instance.cliente_id).values_list('agente_id', flat=True).first()
+    invalidar_lista(TODOS, agente_id)
+
+
+@receiver(post_save, sender=AgenteVentas)
+@receiver(post_delete, sender=AgenteVentas)
+def agente_lista_modificada(sender, instance, **kwargs):
+    invalidar_lista(TODOS, instance.pk)
+
+
+@receiver(post_save, sender=TipoEntidad)
+@receiver(post_delete, sender=TipoEntidad)
+def tipo_entidad_modificado(sender, instance, **kwargs):
+    invalidar_lista(GLOBAL)
+
+
+#====================================
+# Borrados para la sincronización incremental (clientes/cambios.py)
+#====================================
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Direccion)
+def registro_eliminado(sender, instance, **kwargs):
+    registrar_eliminacion(instance)
+
+
+@receiver(post_save, sender=Cliente)
+def cliente_reasignado(sender, instance, created, **kwargs):
+    # El agente anterior lo deja de ver: para su sincronización es un borrado
+    anterior = getattr(instance, '_agente_anterior_id', None)
+    if not created and anterior is not None and anterior != instance.agente_id:
+        registrar_reasignaciones([(instance.pk, anterior)])
+
+
+#====================================
+# Índice de búsqueda de texto completo (clientes/busqueda.py)
+#====================================
+@receiver(post_save, sender=Cliente)
+def cliente_indexado(sender, instance, **kwargs):
+    busqueda.indexar([instance.pk])
+
+
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+def direccion_indexada(sender, instance, **kwargs):
+    # El documento del cliente incluye el texto de todas sus direcciones
+    busqueda.indexar([instance.cliente_id])
+
+
+@receiver(post_delete, sender=Cliente)
+def cliente_desindexado(sender, instance, **kwargs):
+    busqueda.quitar([instance.pk])
+
+
+#====================================
+# Opciones de los selects con autocompletado (clientes/autocompletar.py)
+#====================================
+@receiver(post_save, sender=AgenteVentas)
+@receiver(post_delete, sender=AgenteVentas)
+@receiver(post_save, sender=TipoEntidad)
+@receiver(post_delete, sender=TipoEntidad)
+@receiver(post_save, sender=TipoDireccion)
+@receiver(post_delete, sender=TipoDireccion)
+def opciones_modificadas(sender, **kwargs):
+    autocompletar.invalidar(sender)
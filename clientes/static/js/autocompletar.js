@@ -0,0 +1,123 @@
+/*
+ * Selects con autocompletado (clientes/widgets.py -> SelectAutocompletar).
+ *
+ * El servidor solo renderiza la opción elegida. Sobre cada
+ * <select data-autocompletar="url"> se agrega un campo de búsqueda que pide
+ * las opciones por páginas a esa URL (?q=&pagina=) y las carga en el select;
+ * la última opción "Más resultados..." trae la página siguiente.
+ */
+(function () {
+  'use strict';
+
+  var ESPERA_MS = 250;
+  var MAS = '__mas__';
+
+  function iniciar(select) {
+    if (select.dataset.autocompletarListo) {
+      return;
+    }
+    select.dataset.autocompletarListo = '1';
+
+    var buscador = document.createElement('input');
+    buscador.type = 'search';
+    buscador.className = 'form-control form-control-sm mb-1';
+    buscador.placeholder = select.dataset.buscar || '';
+    buscador.autocomplete = 'off';
+    select.parentNode.insertBefore(buscador, select);
+
+    var estado = {texto: null, pagina: 0, mas: false, pedido: 0, temporizador: null};
+
+    function opcionMas() {
+      var opcion = document.createElement('option');
+      opcion.value = MAS;
+      opcion.textContent = select.dataset.mas || '...';
+      return opcion;
+    }
+
+    function quitarMas() {
+      var opcion = select.querySelector('option[value="' + MAS + '"]');
+      if (opcion) {
+        opcion.remove();
+      }
+    }
+
+    function cargar(texto, pagina) {
+      var pedido = ++estado.pedido;
+      var url = select.dataset.autocompletar
+        + '?q=' + encodeURIComponent(texto) + '&pagina=' + pagina;
+
+      fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+        .then(function (respuesta) { return respuesta.json(); })
+        .then(function (datos) {
+          // Una respuesta lenta de una búsqueda anterior no pisa la actual
+          if (pedido !== estado.pedido) {
+            return;
+          }
+          var elegido = select.value;
+          quitarMas();
+          if (pagina === 1) {
+            // Quedan la opción vacía y la elegida; el resto se reemplaza
+            Array.prototype.slice.call(select.options).forEach(function (opcion) {
+              if (opcion.value !== '' && opcion.value !== elegido) {
+                opcion.remove();
+              }
+            });
+          }
+          datos.resultados.forEach(function (fila) {
+            var valor = String(fila.id);
+            if (valor === elegido) {
+              return;
+            }
+            var opcion = document.createElement('option');
+            opcion.value = valor;
+            opcion.textContent = fila.texto;
+            select.appendChild(opcion);
+          });
+          if (datos.mas) {
+            select.appendChild(opcionMas());
+          }
+          estado.texto = texto;
+          estado.pagina = pagina;
+          estado.mas = datos.mas;
+        });
+    }
+
+    buscador.addEventListener('input', function () {
+      clearTimeout(estado.temporizador);
+      estado.temporizador = setTimeout(function () {
+        cargar(buscador.value.trim(), 1);
+      }, ESPERA_MS);
+    });
+
+    // La primera página se pide recién cuando el usuario llega al campo
+    function primeraCarga() {
+      if (estado.texto === null) {
+        cargar(buscador.value.trim(), 1);
+      }
+    }
+    select.addEventListener('focus', primeraCarga);
+    buscador.addEventListener('focus', primeraCarga);
+
+    var anterior = select.value;
+    select.addEventListener('change', function () {
+      if (select.value === MAS) {
+        select.value = anterior;
+        cargar(estado.texto || '', estado.pagina + 1);
+        return;
+      }
+      anterior = select.value;
+    });
+  }
+
+  function iniciarTodos(raiz) {
+    (raiz || document).querySelectorAll('select[data-autocompletar]').forEach(iniciar);
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', function () { iniciarTodos(); });
+  } else {
+    iniciarTodos();
+  }
+
+  window.autocompletar = {iniciar: iniciarTodos};
+})();
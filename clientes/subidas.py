@@ -0,0 +1,62 @@
+"""
+Recepción de planillas de importación.
+
+``SubidaImportacionHandler`` escribe la planilla directo a un archivo
+temporal (nunca en memoria, sin importar su tamaño) y calcula su SHA-256 por
+bloques mientras llega, de modo que la vista no necesita volver a leerla
+para obtener ``hash_archivo``. Si la subida supera
+``IMPORTACION_TAMANO_MAXIMO`` se corta sin guardar nada más.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+
+TAMANO_MAXIMO = getattr(settings, 'IMPORTACION_TAMANO_MAXIMO', 50 * 1024 * 1024)
+BLOQUE_HASH = 1024 * 1024
+
+
+class SubidaImportacionHandler(TemporaryFileUploadHandler):
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Content-Length ya indica si la petición completa excede el límite: se
+        # rechaza al llegar al archivo, sin escribir nada en disco
+        self.excedido = content_length > TAMANO_MAXIMO
+        self.request.subida_excedida = False
+
+    def new_file(self, *args, **kwargs):
+        if self.excedido:
+            self._rechazar()
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.recibidos = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recibidos += len(raw_data)
+        if self.recibidos > TAMANO_MAXIMO:
+            self._rechazar()
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        archivo.sha256 = self.sha256.hexdigest()
+        return archivo
+
+    def _rechazar(self):
+        self.request.subida_excedida = True
+        # Sin connection_reset Django descarta el resto del cuerpo y la vista
+        # puede responder con el error en el formulario
+        raise StopUpload(connection_reset=False)
+
+
+def hash_archivo(archivo):
+    """SHA-256 del archivo subido; lo toma del handler si ya lo calculó."""
+    if getattr(archivo, 'sha256', None):
+        return archivo.sha256
+    sha256 = hashlib.sha256()
+    for bloque in archivo.chunks(BLOQUE_HASH):
+        sha256.update(bloque)
+    archivo.seek(0)
+    return sha256.hexdigest()
@@ -1,3 +1,324 @@
-from django.test import TestCase
+import base64
+import hashlib
+import importlib
+import csv
+import io
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from unittest import mock
+from django.utils import timezone
+
+from . import busqueda, duplicados, importacion
+from .acciones import DESACTIVAR, REASIGNAR, aplicar
+from .cambios import eliminados
+from .forms import AccionMasivaForm
+from .fragmentos import TODOS, generacion, invalidar_lista
+from .middleware import PerfilUsuario
+from .models import AgenteVentas, CandidatoDuplicado, Cliente, ImportacionLog, TipoEntidad, Trabajo
+from .normalizacion import digito_verificador
+from .trabajos import MINUTOS_ABANDONO, recuperar_abandonados
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SelectAutocompletarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('supervisor', password='clave123')
+        cls.usuario.groups.add(Group.objects.get_or_create(name='Supervisor')[0])
+        cls.agente = AgenteVentas.objects.create(nombre='Ana Pérez', rut='11.111.111-1', email='ana@x.cl')
+        TipoEntidad.objects.get_or_create(nombre='Empresa')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_pk_invalida_en_consulta(self):
+        respuesta = self.client.get('/es/consulta/', {'agente': 'abc'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotContains(respuesta, 'value="abc"')
+
+    def test_pk_invalida_en_formulario(self):
+        respuesta = self.client.post('/es/nuevo/', {'agente': 'abc', 'tipo_entidad': 'x'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['form'].errors['agente'])
+
+    def test_pk_elegida(self):
+        respuesta = self.client.get('/es/consulta/', {'agente': self.agente.pk})
+        self.assertContains(respuesta, f'<option value="{self.agente.pk}" selected>Ana Pérez</option>', html=True)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EtagMensajesTests(TestCase):
+
+    def test_sin_304_con_mensajes_pendientes(self):
+        usuario = User.objects.create_user('supervisor')
+        usuario.groups.add(Group.objects.get_or_create(name='Supervisor')[0])
+        self.client.force_login(usuario)
+        self.client.get('/es/consulta/')  # fija la cookie CSRF, que forma parte del ETag
+        etag = self.client.get('/es/consulta/')['ETag']
+        self.assertEqual(self.client.get('/es/consulta/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post('/es/acciones-masivas/', {'accion': DESACTIVAR, 'volver': '/es/consulta/'})
+        respuesta = self.client.get('/es/consulta/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Selecciona clientes o aplica un filtro.')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExportacionExcelTests(TestCase):
+
+    def test_requiere_sesion(self):
+        respuesta = self.client.get('/es/consulta/exportar-excel/')
+        self.assertEqual(respuesta.status_code, 302)
+
+
+class RecuperarAbandonadosTests(TestCase):
+
+    def test_no_reencola_exportaciones(self):
+        antiguo = timezone.now() - timedelta(minutes=MINUTOS_ABANDONO + 1)
+        trabajo = Trabajo.objects.create(tipo=Trabajo.EXPORTACION_PDF, estado=Trabajo.EN_PROCESO, iniciado=antiguo)
+        self.assertEqual(recuperar_abandonados(), 0)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, Trabajo.EN_PROCESO)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class InvalidarListaTests(TestCase):
+
+    def test_generacion_cambia_al_confirmar(self):
+        anterior = generacion(TODOS)
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidar_lista(TODOS)
+            self.assertEqual(generacion(TODOS), anterior)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(generacion(TODOS), anterior)
+
+
+class AccionMasivaBusquedaTests(TestCase):
+
+    def test_filtro_con_busqueda_se_limita_a_lo_mostrado(self):
+        Cliente.objects.bulk_create(
+            Cliente(nombre_razon_social=f'Ferretería {i}', rut=f'{i}-0', email=f'f{i}@x.cl', telefono='1')
+            for i in range(busqueda.LIMITE + 5)
+        )
+        busqueda.indexar(Cliente.objects.values_list('pk', flat=True))
+        form = AccionMasivaForm({'accion': DESACTIVAR, 'filtro': 'q=ferreteria'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.clientes().count(), busqueda.LIMITE)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ApiBasicTests(TestCase):
+
+    def test_cambio_de_clave_revoca_credencial_recordada(self):
+        usuario = User.objects.create_user('integracion', password='clave123')
+        cabecera = 'Basic ' + base64.b64encode(b'integracion:clave123').decode()
+        self.assertEqual(self.client.get('/api/clientes/', HTTP_AUTHORIZATION=cabecera).status_code, 200)
+        usuario.set_password('otra-clave')
+        usuario.save()
+        self.assertEqual(self.client.get('/api/clientes/', HTTP_AUTHORIZATION=cabecera).status_code, 401)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReasignacionCambiosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agentes = [
+            AgenteVentas.objects.create(
+                user=User.objects.create_user(f'agente{i}'), nombre=f'Agente {i}', rut=rut, email=f'a{i}@x.cl',
+            )
+            for i, rut in enumerate(['11.111.111-1', '22.222.222-2'])
+        ]
+        supervisor = User.objects.create_user('supervisor')
+        supervisor.groups.add(Group.objects.get_or_create(name='Supervisor')[0])
+        cls.supervisor = supervisor
+
+    def setUp(self):
+        self.desde = timezone.now()
+        self.cliente = Cliente.objects.create(
+            nombre_razon_social='Cliente', rut='5.126.663-3', email='c@x.cl', telefono='1', agente=self.agentes[0],
+        )
+
+    def borrados(self, user):
+        return eliminados(PerfilUsuario(user), self.desde, timezone.now() + timedelta(seconds=1))['clientes']
+
+    def comprobar(self):
+        self.assertEqual(self.borrados(self.agentes[0].user), [self.cliente.pk])
+        self.assertEqual(self.borrados(self.agentes[1].user), [])
+        self.assertEqual(self.borrados(self.supervisor), [])
+
+    def test_edicion(self):
+        self.cliente.agente = self.agentes[1]
+        self.cliente.save()
+        self.comprobar()
+
+    def test_accion_masiva(self):
+        self.assertEqual(aplicar(Cliente.objects.filter(pk=self.cliente.pk), REASIGNAR, agente=self.agentes[1]), 1)
+        self.comprobar()
+
+    def test_vuelve_al_agente(self):
+        aplicar(Cliente.objects.filter(pk=self.cliente.pk), REASIGNAR, agente=self.agentes[1])
+        aplicar(Cliente.objects.filter(pk=self.cliente.pk), REASIGNAR, agente=self.agentes[0])
+        self.assertEqual(self.borrados(self.agentes[0].user), [])
+        self.assertEqual(self.borrados(self.agentes[1].user), [self.cliente.pk])
+
+
+def planilla_csv(filas):
+    """CSV en memoria con las columnas de plantilla_clientes.xlsx."""
+    texto = io.StringIO()
+    escritor = csv.writer(texto)
+    escritor.writerow(importacion.COLUMNAS)
+    escritor.writerows(filas)
+    return io.BytesIO(texto.getvalue().encode('utf-8'))
+
+
+def fila_cliente(i, valida=True):
+    numero = 10_000_000 + i
+    dv = digito_verificador(numero)
+    if not valida:
+        dv = '1' if dv == '0' else '0'
+    rut = f'{numero}-{dv}'
+    return ['', f'Cliente {i}', rut, f'c{i}@x.cl', '', '', '', 'Calle', str(i), 'Comuna', 'Ciudad', '', 'Chile', '']
+
+
+def importar(log, filas, **opciones):
+    importador = importacion.ImportadorClientes(log, **opciones)
+    total, pendientes = importacion.leer_planilla(
+        planilla_csv(filas), 'planilla.csv', fila_inicio=importador.fila_inicio,
+    )
+    return importador.importar(pendientes, total)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ErroresImportacionTests(TestCase):
+
+    def test_errores_guardados_con_tope(self):
+        log = ImportacionLog.objects.create(archivo='planilla.csv', hash_archivo='a')
+        with mock.patch.object(importacion, 'MAX_ERRORES', 5):
+            importar(log, [fila_cliente(i, valida=False) for i in range(20)], tamano_lote=4)
+        log.refresh_from_db()
+        self.assertEqual(log.fallidos, 20)
+        self.assertEqual(len(json.loads(log.errores)), 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReanudarImportacionTests(TestCase):
+
+    def setUp(self):
+        self.filas = [fila_cliente(i) for i in range(10)]
+
+    def test_retoma_desde_el_ultimo_lote(self):
+        log = ImportacionLog.objects.create(archivo='planilla.csv', hash_archivo='a')
+        original = importacion.ImportadorClientes.procesar_lote
+        llamadas = []
+
+        def interrumpir(importador, lote):
+            llamadas.append(lote)
+            if len(llamadas) == 2:
+                raise RuntimeError('worker caído')
+            return original(importador, lote)
+
+        with mock.patch.object(importacion.ImportadorClientes, 'procesar_lote', interrumpir):
+            with self.assertRaises(RuntimeError):
+                importar(log, self.filas, tamano_lote=4)
+        log.refresh_from_db()
+        self.assertEqual((log.ultima_fila, log.procesadas, log.exitosos), (5, 4, 4))
+        self.assertNotEqual(log.estado, ImportacionLog.TERMINADO)
+        self.assertEqual(Cliente.objects.count(), 4)
+
+        importador = importacion.ImportadorClientes(log, tamano_lote=4)
+        self.assertEqual(importador.fila_inicio, 6)
+        importar(log, self.filas, tamano_lote=4)
+        log.refresh_from_db()
+        self.assertEqual(log.estado, ImportacionLog.TERMINADO)
+        self.assertEqual((log.procesadas, log.exitosos, log.fallidos), (10, 10, 0))
+        self.assertEqual(Cliente.objects.count(), 10)
+
+    def test_subir_de_nuevo_retoma(self):
+        usuario = User.objects.create_user('importador')
+        self.client.force_login(usuario)
+        contenido = planilla_csv(self.filas).getvalue()
+        log = ImportacionLog.objects.create(
+            archivo='planilla.csv', usuario=usuario, hash_archivo=hashlib.sha256(contenido).hexdigest(),
+            estado=ImportacionLog.FALLIDO, ultima_fila=5,
+        )
+        archivo = io.BytesIO(contenido)
+        archivo.name = 'planilla.csv'
+        respuesta = self.client.post('/es/importar/', {'archivo': archivo})
+        self.assertRedirects(respuesta, f'/es/importar/{log.pk}/', fetch_redirect_response=False)
+        self.assertEqual(ImportacionLog.objects.count(), 1)
+        self.assertTrue(log.trabajos.filter(estado=Trabajo.PENDIENTE).exists())
+        log.refresh_from_db()
+        self.assertEqual(log.estado, ImportacionLog.PENDIENTE)
+
+
+class RutNormalizadoTests(TestCase):
+
+    def setUp(self):
+        numero = 12_345_678
+        self.rut = f'{numero:,}'.replace(',', '.') + f'-{digito_verificador(numero)}'
+        self.rut_compacto = f'{numero}{digito_verificador(numero)}'
+        # bulk_create no llama a save(): quedan como antes de la migración 0009
+        self.antiguo, self.repetido = Cliente.objects.bulk_create([
+            Cliente(nombre_razon_social='Antiguo', rut=self.rut, email='a@x.cl', telefono='1'),
+            Cliente(nombre_razon_social='Repetido', rut=self.rut_compacto, email='b@x.cl', telefono='1'),
+        ])
+        migracion = importlib.import_module('clientes.migrations.0009_rut_normalizado')
+        migracion.poblar_rut_normalizado(apps, None)
+        self.antiguo.refresh_from_db()
+        self.repetido.refresh_from_db()
+
+    def test_migracion_deja_en_null_el_repetido(self):
+        self.assertEqual(self.antiguo.rut_normalizado, '12345678-5')
+        self.assertIsNone(self.repetido.rut_normalizado)
+
+    def test_clean_rechaza_el_mismo_rut_con_otro_formato(self):
+        with self.assertRaises(ValidationError) as error:
+            self.repetido.clean()
+        self.assertIn('rut', error.exception.message_dict)
+
+    def test_save_del_repetido_no_falla(self):
+        self.repetido.observacion = 'revisar'
+        self.repetido.save()
+        self.repetido.refresh_from_db()
+        self.assertIsNone(self.repetido.rut_normalizado)
+        self.antiguo.save()
+        self.antiguo.refresh_from_db()
+        self.assertEqual(self.antiguo.rut_normalizado, '12345678-5')
+
+
+class DetectorDuplicadosTests(TestCase):
+
+    def setUp(self):
+        # 30 clientes guardados con el teléfono de una central (y otro dominio: no son candidatos)
+        guardados = [
+            Cliente(nombre_razon_social=f'Sucursal {i}', rut=f'{i}-0', email=f's{i}@otra{i}.cl',
+                    telefono='+56 9 1234 5678')
+            for i in range(30)
+        ]
+        for cliente in guardados:
+            cliente.actualizar_campos_normalizados()
+        Cliente.objects.bulk_create(guardados)
+        self.nuevo = Cliente.objects.create(
+            nombre_razon_social='Nueva', rut='99-0', email='nueva@central.cl', telefono='+56 9 1234 5678',
+        )
+        self.detector = duplicados.DetectorDuplicados(ImportacionLog.objects.create(archivo='p.csv', hash_archivo='d'))
+
+    def comparaciones(self):
+        with mock.patch.object(duplicados, 'motivos', wraps=duplicados.motivos) as motivos:
+            self.detector.revisar_lote([self.nuevo], [2])
+        self.assertEqual(CandidatoDuplicado.objects.count(), 0)
+        return motivos.call_count
+
+    def test_clave_compartida_aporta_a_lo_mas_max_candidatos(self):
+        self.assertEqual(self.comparaciones(), duplicados.MAX_CANDIDATOS)
+
+    def test_clave_frecuente_no_se_busca_en_la_tabla(self):
+        with mock.patch.object(duplicados, 'MAX_POR_CLAVE', 20):
+            self.assertEqual(self.comparaciones(), 0)
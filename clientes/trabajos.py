@@ -0,0 +1,136 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla ``Trabajo``.
+
+Las vistas encolan con ``encolar()`` y responden de inmediato; el comando
+``manage.py procesar_trabajos`` toma los pendientes uno a uno y ejecuta el
+manejador registrado para su tipo con ``@manejador``.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .exportacion import (
+    ENCABEZADOS_CLIENTES, alcance_exportacion, direcciones_visibles, filas_clientes_direcciones, generar_pdf,
+)
+from .importacion import ImportadorClientes, leer_planilla
+from .middleware import PerfilUsuario
+from .models import ImportacionLog, Trabajo
+from .versiones import generar_en_cache, nombre_en_cache
+
+logger = logging.getLogger(__name__)
+
+MANEJADORES = {}
+
+# Un trabajo en proceso sin avance durante este tiempo se da por abandonado (worker caído)
+MINUTOS_ABANDONO = getattr(settings, 'TRABAJOS_MINUTOS_ABANDONO', 15)
+
+
+def manejador(tipo):
+    """Registra la función que procesa los trabajos de ``tipo``."""
+    def registrar(funcion):
+        MANEJADORES[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, **campos):
+    return Trabajo.objects.create(tipo=tipo, **campos)
+
+
+def tomar_siguiente():
+    """
+    Reclama el trabajo pendiente más antiguo. El UPDATE condicionado al
+    estado evita que dos workers tomen el mismo trabajo.
+    """
+    pendientes = (
+        Trabajo.objects
+        .filter(estado=Trabajo.PENDIENTE)
+        .order_by('creado')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in pendientes:
+        tomado = Trabajo.objects.filter(pk=pk, estado=Trabajo.PENDIENTE).update(
+            estado=Trabajo.EN_PROCESO, iniciado=timezone.now()
+        )
+        if tomado:
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+def recuperar_abandonados():
+    """
+    Devuelve a la cola las importaciones que quedaron "en proceso" sin avance
+    reciente porque el worker murió. Registran su avance en cada lote, así
+    que se retoman desde su último punto de control. Las exportaciones no
+    informan avance: no se puede distinguir un PDF grande de uno abandonado
+    y reencolarlo lo generaría dos veces.
+    """
+    limite = timezone.now() - timedelta(minutes=MINUTOS_ABANDONO)
+    abandonados = Trabajo.objects.filter(estado=Trabajo.EN_PROCESO, tipo=Trabajo.IMPORTACION).filter(
+        Q(importacion__actualizado__lt=limite)
+        | Q(importacion__actualizado__isnull=True, iniciado__lt=limite)
+    )
+    return Trabajo.objects.filter(pk__in=list(abandonados.values_list('pk', flat=True))).update(
+        estado=Trabajo.PENDIENTE
+    )
+
+
+def reanudar_importacion(log, usuario=None):
+    """
+    Encola la continuación de una importación interrumpida. Devuelve
+    ``None`` si ya tiene un trabajo pendiente o en proceso.
+    """
+    activos = log.trabajos.filter(estado__in=[Trabajo.PENDIENTE, Trabajo.EN_PROCESO])
+    if log.estado == ImportacionLog.TERMINADO or activos.exists():
+        return None
+    ImportacionLog.objects.filter(pk=log.pk).update(estado=ImportacionLog.PENDIENTE)
+    log.estado = ImportacionLog.PENDIENTE
+    return encolar(Trabajo.IMPORTACION, importacion=log, usuario=usuario)
+
+
+def ejecutar(trabajo):
+    try:
+        MANEJADORES[trabajo.tipo](trabajo)
+    except Exception:
+        logger.exception("Falló el trabajo %s", trabajo.pk)
+        trabajo.estado = Trabajo.FALLIDO
+        trabajo.error = traceback.format_exc()
+        if trabajo.importacion_id:
+            ImportacionLog.objects.filter(pk=trabajo.importacion_id).update(estado=ImportacionLog.FALLIDO)
+    else:
+        trabajo.estado = Trabajo.TERMINADO
+    trabajo.terminado = timezone.now()
+    trabajo.save(update_fields=['estado', 'error', 'terminado', 'resultado'])
+    return trabajo
+
+
+#====================================
+# Manejadores
+#====================================
+@manejador(Trabajo.IMPORTACION)
+def importar_planilla(trabajo):
+    log = trabajo.importacion
+    if log.estado == ImportacionLog.TERMINADO:
+        return
+    importador = ImportadorClientes(log)
+    # Se lee desde la ruta en disco; al reanudar, después de la última fila confirmada
+    total, filas = leer_planilla(log.archivo.path, log.archivo.name, fila_inicio=importador.fila_inicio)
+    importador.importar(filas, total=total)
+
+
+@manejador(Trabajo.EXPORTACION_PDF)
+def exportar_pdf(trabajo):
+    perfil = PerfilUsuario(trabajo.usuario)
+    direcciones = direcciones_visibles(perfil)
+    # Se reutiliza el PDF ya generado para esta versión de los datos, si existe
+    ruta = generar_en_cache(
+        nombre_en_cache(f'clientes_direcciones_{alcance_exportacion(perfil)}', 'pdf'),
+        lambda destino: generar_pdf(destino, ENCABEZADOS_CLIENTES, filas_clientes_direcciones(direcciones)),
+    )
+    with open(ruta, 'rb') as archivo:
+        trabajo.resultado.save(f'clientes_direcciones_{trabajo.pk}.pdf', File(archivo), save=False)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import autocompletar, views
 
 """
 app_name = 'clientes'  # 👈 Esto es lo que registra el namespace. Sin ella, el namespace no existe
@@ -15,8 +15,18 @@ urlpatterns = [
     path('direccion/<int:pk>/editar/', views.editar_direccion, name='editar_direccion'),
     path('direccion/<int:pk>/eliminar/', views.eliminar_direccion, name='eliminar_direccion'),
     path('consulta/', views.consulta_clientes, name='consulta_clientes'),
+    path('acciones-masivas/', views.acciones_masivas, name='acciones_masivas'),
     path('consulta/exportar-excel/', views.exportar_clientes_excel, name='exportar_clientes_excel'),
     path('consulta/exportar-pdf/', views.exportar_clientes_pdf, name='exportar_clientes_pdf'),
+    path('consulta/exportar-cambios/', views.exportar_cambios_excel, name='exportar_cambios_excel'),
+    path('trabajos/<int:pk>/', views.detalle_trabajo, name='detalle_trabajo'),
+    path('trabajos/<int:pk>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
     path('importar/', views.importar_clientes, name='importar_clientes'),
+    path('importar/duplicados/', views.duplicados_importacion, name='duplicados_importacion'),
+    path('importar/<int:pk>/', views.detalle_importacion, name='detalle_importacion'),
+    path('importar/<int:pk>/progreso/', views.progreso_importacion, name='progreso_importacion'),
+    path('importar/<int:pk>/reanudar/', views.reanudar_importacion_view, name='reanudar_importacion'),
     path('dashboard/', views.dashboard_supervisor, name='dashboard_supervisor'),
+    path('autocompletar/<str:fuente>/', autocompletar.autocompletar, name='autocompletar'),
+    path('dashboard/rendimiento/', views.rendimiento_vistas, name='rendimiento_vistas'),
 ]
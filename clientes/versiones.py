@@ -0,0 +1,146 @@
+"""
+Versión de los datos de clientes y direcciones.
+
+``VersionDatos`` guarda un contador y la fecha del último cambio; las
+señales lo incrementan en cada save/delete y las escrituras masivas llaman a
+``marcar_cambio()``. Con eso se arman ETag/Last-Modified (respuestas 304) y
+el nombre de los archivos de exportación guardados en disco.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import get_language
+
+from .models import VersionDatos
+
+
+CLAVE_CACHE = 'clientes:version_datos'
+CACHE_DIR = getattr(
+    settings, 'EXPORTACION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gestion_clientes_exportaciones')
+)
+
+
+def version_actual():
+    """Devuelve ``(version, modificado)`` sin ir a la base de datos si está en caché."""
+    datos = cache.get(CLAVE_CACHE)
+    if datos is None:
+        registro, _ = VersionDatos.objects.get_or_create(pk=1)
+        datos = (registro.version, registro.modificado)
+        cache.set(CLAVE_CACHE, datos, 300)
+    return datos
+
+
+def marcar_cambio():
+    actualizados = VersionDatos.objects.filter(pk=1).update(
+        version=F('version') + 1, modificado=timezone.now()
+    )
+    if not actualizados:
+        VersionDatos.objects.get_or_create(pk=1)
+    cache.delete(CLAVE_CACHE)
+    # Si hay una transacción abierta, otra petición pudo volver a cachear la versión vieja
+    transaction.on_commit(lambda: cache.delete(CLAVE_CACHE))
+
+
+#====================================
+# Funciones para @condition (ETag / Last-Modified)
+#====================================
+def _mensajes_pendientes(request):
+    # len() no marca los mensajes como leídos
+    return len(messages.get_messages(request)) > 0
+
+
+def ultima_modificacion(request, *args, **kwargs):
+    if _mensajes_pendientes(request):
+        return None
+    return version_actual()[1]
+
+
+def etag_por_usuario(request, *args, **kwargs):
+    """
+    ETag para páginas HTML: además de los datos dependen del usuario, del
+    idioma, de los filtros y del token CSRF incluido en los formularios.
+    Con mensajes pendientes no hay ETag: un 304 dejaría el mensaje sin mostrar.
+    """
+    if _mensajes_pendientes(request):
+        return None
+    partes = [
+        str(version_actual()[0]),
+        str(request.user.pk),
+        get_language() or '',
+        request.GET.urlencode(),
+        request.META.get('CSRF_COOKIE', ''),
+    ]
+    return hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+#====================================
+# Caché en disco de exportaciones
+#====================================
+def nombre_en_cache(prefijo, extension):
+    return '%s_v%d.%s' % (prefijo, version_actual()[0], extension)
+
+
+def archivo_cacheado(nombre):
+    """Ruta del archivo ya generado para esta versión, o ``None``."""
+    ruta = os.path.join(CACHE_DIR, nombre)
+    return ruta if os.path.exists(ruta) else None
+
+
+def _publicar(temporal, nombre):
+    """Mueve el archivo terminado a su nombre final y borra versiones anteriores."""
+    os.replace(temporal, os.path.join(CACHE_DIR, nombre))
+    prefijo = nombre.rsplit('_v', 1)[0] + '_v'
+    for otro in os.listdir(CACHE_DIR):
+        if otro.startswith(prefijo) and otro != nombre and not otro.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(CACHE_DIR, otro))
+            except OSError:
+                pass
+
+
+def cachear_fragmentos(nombre, fragmentos):
+    """
+    Reenvía los fragmentos de un StreamingHttpResponse y a la vez los escribe
+    en disco; el archivo solo se publica si la generación termina completa.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    completo = False
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            for fragmento in fragmentos:
+                destino.write(fragmento)
+                yield fragmento
+        completo = True
+    finally:
+        if completo:
+            _publicar(temporal, nombre)
+        elif os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def generar_en_cache(nombre, escribir):
+    """
+    Devuelve la ruta del archivo ``nombre`` en la caché, generándolo con
+    ``escribir(destino)`` si todavía no existe.
+    """
+    ruta = archivo_cacheado(nombre)
+    if ruta:
+        return ruta
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            escribir(destino)
+    except BaseException:
+        os.remove(temporal)
+        raise
+    _publicar(temporal, nombre)
+    return os.path.join(CACHE_DIR, nombre)
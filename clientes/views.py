@@ -6,40 +6,96 @@ from django.contrib import messages
 from django.http import HttpResponseForbidden
 from django.utils.translation import gettext as _
 
-from .models import Cliente, Direccion, ImportacionLog, AgenteVentas
-from .forms import ClienteForm, DireccionForm, DireccionFormSet, ImportacionForm
+from .models import Cliente, Direccion, ImportacionLog
+from .forms import AccionMasivaForm, ClienteForm, ConsultaClientesForm, DireccionForm, DireccionFormSet, ImportacionForm
+from .paginacion import PaginaKeyset, paginar_keyset
+from .busqueda import buscar
+from .fragmentos import alcance_lista, lista_cacheada
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .estadisticas import obtener_estadisticas
+from .instrumentacion import resumen_por_vista
 
 #from django.shortcuts import render
 
 ### Exportar a Excel ####
-import openpyxl
-from openpyxl.utils import get_column_letter
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from .exportacion import (
+    CONTENT_TYPE_XLSX, ENCABEZADOS_CAMBIOS, ENCABEZADOS_CLIENTES, filas_cambios, filas_clientes_direcciones,
+    generar_excel,
+)
+from .cambios import clientes_cambiados, eliminados, ventana
 
 ### Exportar a Pdf ####
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+import os
+from django.conf import settings
+from django.http import FileResponse, Http404
+from .exportacion import alcance_exportacion, direcciones_visibles, generar_pdf
+
+### Respuestas condicionales (ETag / Last-Modified) ####
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .versiones import (
+    archivo_cacheado, cachear_fragmentos, etag_por_usuario, generar_en_cache,
+    nombre_en_cache, ultima_modificacion,
+)
+
+# Sobre este número de filas el PDF se genera como trabajo en segundo plano
+PDF_FILAS_SINCRONICAS = getattr(settings, 'PDF_FILAS_SINCRONICAS', 5000)
 
 ### Importación planilla de clientes ####
-import hashlib
 import json
-from openpyxl import load_workbook
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from .subidas import TAMANO_MAXIMO, SubidaImportacionHandler, hash_archivo as calcular_hash
+from .models import CandidatoDuplicado, Trabajo
+from .importacion import EXTENSIONES_PERMITIDAS
+from .trabajos import encolar, reanudar_importacion
+from urllib.parse import urlencode
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from .acciones import aplicar as aplicar_accion
 
 
-# Helper para chequear si el usuario es supervisor
-def is_supervisor(user):
-    return user.groups.filter(name='Supervisor').exists()
-
 @login_required
 def lista_clientes(request):
-    if is_supervisor(request.user):
-        clientes = Cliente.objects.all()
+    es_supervisor = request.perfil.es_supervisor
+    alcance = alcance_lista(request.perfil)
+
+    texto = request.GET.get('q', '').strip()
+
+    def construir():
+        # Supervisor: todos; agente: solo los suyos
+        clientes = request.perfil.clientes_visibles().select_related('tipo_entidad', 'agente')
+
+        if texto:
+            # Búsqueda de texto completo: los más relevantes primero, sin paginar
+            pagina = PaginaKeyset(buscar(clientes, texto), request.GET)
+        else:
+            # Paginación por cursor (?despues= / ?antes=) para no cargar la tabla completa
+            pagina = paginar_keyset(clientes, request.GET)
+        return {
+            'filas': render_to_string('clientes/_filas_lista.html', {
+                'clientes': pagina,
+                'es_supervisor': es_supervisor,
+            }),
+            'siguiente': pagina.siguiente,
+            'anterior': pagina.anterior,
+        }
+
+    # Filas renderizadas por agente/página, invalidadas por señales (clientes/fragmentos.py)
+    if alcance is None:
+        fragmento = construir()
     else:
-        # filtro por agente relacionado al usuario
-        clientes = Cliente.objects.filter(agente__user=request.user)
+        fragmento = lista_cacheada(alcance, request.GET, construir)
+
     return render(request, 'clientes/lista.html', {
-        'clientes': clientes, 
-        'es_supervisor': is_supervisor(request.user)
+        'filas': mark_safe(fragmento['filas']),
+        'pagina': PaginaKeyset([], request.GET, fragmento['siguiente'], fragmento['anterior']),
+        'es_supervisor': es_supervisor,
+        'accion_form': AccionMasivaForm() if es_supervisor else None,
+        'q': texto,
     })
 
 @login_required
@@ -52,7 +108,7 @@ def crear_cliente(request):
     # Instanciamos el form
     cliente_form = ClienteForm(request.POST or None)
     # Si es agente, removemos el campo 'agente' del form para que no lo vea
-    if not is_supervisor(request.user) and 'agente' in cliente_form.fields:
+    if not request.perfil.es_supervisor and 'agente' in cliente_form.fields:
         del cliente_form.fields['agente']
 
     direccion_formset = DireccionFormSet(request.POST or None)
@@ -63,13 +119,11 @@ def crear_cliente(request):
             # Guardamos cliente sin commit para asignar agente si es necesario
             cliente = cliente_form.save(commit=False)
 
-            if not is_supervisor(request.user):
-                try:
-                    agente = AgenteVentas.objects.get(user=request.user)
-                    cliente.agente = agente
-                except AgenteVentas.DoesNotExist:
+            if not request.perfil.es_supervisor:
+                if request.perfil.agente is None:
                     messages.error(request, "Tu usuario no está registrado como agente de ventas.")
                     return redirect('lista_clientes')
+                cliente.agente = request.perfil.agente
             else:
                 cliente.agente = cliente_form.cleaned_data['agente']
 
@@ -95,13 +149,13 @@ def editar_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
 
     # Control de permisos: solo supervisor o el agente propietario
-    if not is_supervisor(request.user) and cliente.agente.user != request.user:
+    if not request.perfil.puede_gestionar(cliente):
         return HttpResponseForbidden("No tienes permiso para editar este cliente.")
 
     if request.method == "POST":
         form = ClienteForm(request.POST, instance=cliente)
         # Si no es supervisor, impedir que cambie el agente
-        if not is_supervisor(request.user) and 'agente' in form.fields:
+        if not request.perfil.es_supervisor and 'agente' in form.fields:
             del form.fields['agente']
 
         if form.is_valid():
@@ -110,7 +164,7 @@ def editar_cliente(request, pk):
             return redirect("lista_clientes")
     else:
         form = ClienteForm(instance=cliente)
-        if not is_supervisor(request.user) and 'agente' in form.fields:
+        if not request.perfil.es_supervisor and 'agente' in form.fields:
             del form.fields['agente']
 
     # Obtiene las direcciones existentes para mostrar en la plantilla
@@ -132,7 +186,7 @@ def confirmar_eliminar_cliente(request, pk):
     - Sólo propietario o supervisor.
     """
     cliente = get_object_or_404(Cliente, pk=pk)
-    if not is_supervisor(request.user) and cliente.agente.user != request.user:
+    if not request.perfil.puede_gestionar(cliente):
         return HttpResponseForbidden("No tienes permiso para eliminar este cliente.")
 
     if request.method == 'POST':
@@ -150,10 +204,10 @@ def agregar_direccion(request, cliente_id):
     """
     cliente = get_object_or_404(Cliente, pk=cliente_id)
     
-    if not (is_supervisor(request.user) or cliente.agente.user == request.user):
+    if not request.perfil.puede_gestionar(cliente):
         return HttpResponseForbidden(
             f"No tienes permiso para agregar direcciones a este cliente. "
-            f"(Agente asignado: {escape(str(cliente.agente.user))} | Usuario actual: {escape(str(request.user))})"
+            f"(Agente asignado: {escape(str(getattr(cliente.agente, 'user', None)))} | Usuario actual: {escape(str(request.user))})"
         )
 
     form = DireccionForm(request.POST or None)
@@ -176,9 +230,9 @@ def editar_direccion(request, pk):
     Editar una dirección:
     - Sólo propietario o supervisor.
     """
-    direccion = get_object_or_404(Direccion, pk=pk)
+    direccion = get_object_or_404(Direccion.objects.select_related('cliente'), pk=pk)
     cliente = direccion.cliente
-    if not is_supervisor(request.user) and cliente.agente.user != request.user:
+    if not request.perfil.puede_gestionar(cliente):
         return HttpResponseForbidden("No tienes permiso para editar esta dirección.")
 
     form = DireccionForm(request.POST or None, instance=direccion)
@@ -199,9 +253,9 @@ def eliminar_direccion(request, pk):
     Eliminar una dirección:
     - Sólo propietario o supervisor.
     """
-    direccion = get_object_or_404(Direccion, pk=pk)
+    direccion = get_object_or_404(Direccion.objects.select_related('cliente'), pk=pk)
     cliente = direccion.cliente
-    if not is_supervisor(request.user) and cliente.agente.user != request.user:
+    if not request.perfil.puede_gestionar(cliente):
         # print(type(cliente.agente), cliente.agente.user)
         # print(type(request.user), request.user)
         return HttpResponseForbidden("No tienes permiso para eliminar esta dirección.")
@@ -241,107 +295,192 @@ def logout_view(request):
 
 ######################### Vistas de Consulta y Exportación a Excel/Pdf #####################
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_usuario, last_modified_func=ultima_modificacion)
 def consulta_clientes(request):
-    clientes = Cliente.objects.select_related('agente').prefetch_related('direcciones')
+    """
+    Consulta de clientes y direcciones con filtros resueltos en la base de datos
+    y paginación por cursor.
+    """
+    form = ConsultaClientesForm(request.GET or None)
+    clientes = Cliente.objects.select_related('agente')
+    if form.is_valid():
+        clientes = form.filtrar(clientes)
+    else:
+        clientes = clientes.prefetch_related('direcciones')
+
+    if form.is_valid() and form.cleaned_data.get('q'):
+        # Búsqueda: los más relevantes primero, sin paginar
+        pagina = PaginaKeyset(buscar(clientes, form.cleaned_data['q']), request.GET)
+    else:
+        pagina = paginar_keyset(clientes, request.GET)
+    accion_form = None
+    if request.perfil.es_supervisor and form.is_valid() and any(form.cleaned_data.values()):
+        # Las acciones masivas de la consulta se aplican al filtro actual
+        filtro = {campo: valor for campo, valor in form.data.items() if campo in form.fields}
+        accion_form = AccionMasivaForm(initial={'filtro': urlencode(filtro)})
     return render(request, 'clientes/consulta.html', {
-        'clientes': clientes
+        'clientes': pagina,
+        'pagina': pagina,
+        'form': form,
+        'accion_form': accion_form,
     })
 
 #====================================
 # Vista para exportar a Excel
 #====================================
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_usuario, last_modified_func=ultima_modificacion)
 def exportar_clientes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Clientes y Direcciones"
-
-    # Encabezados
-    ws.append(["Cliente", "Correo", "Comuna", "Ciudad", "Dirección", "País"])
-
-    # Datos
-    clientes = Cliente.objects.prefetch_related('direcciones')
-    for cliente in clientes:
-        for direccion in cliente.direcciones.all():
-            ws.append([
-                cliente.nombre_razon_social,
-                cliente.email,
-                direccion.comuna,
-                direccion.ciudad,
-                f"{direccion.calle} {direccion.numero}",
-                direccion.pais
-            ])
-
-    # Ajustar tamaño de columnas
-    for col in ws.columns:
-        max_length = 0
-        columna = col[0].column
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ajusta = get_column_letter(columna)
-        ws.column_dimensions[ajusta].width = max_length + 2
-
-    # Respuesta HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    """
+    Exporta a .xlsx en streaming las direcciones visibles para el usuario:
+    las filas se leen por bloques y se envían a medida que se generan.
+    El archivo queda en disco y se reutiliza mientras los datos no cambien.
+    """
+    direcciones = direcciones_visibles(request.perfil)
+    nombre = nombre_en_cache(f'clientes_direcciones_{alcance_exportacion(request.perfil)}', 'xlsx')
+    ruta = archivo_cacheado(nombre)
+    if ruta:
+        response = FileResponse(open(ruta, 'rb'), content_type=CONTENT_TYPE_XLSX)
+    else:
+        response = StreamingHttpResponse(
+            cachear_fragmentos(nombre, generar_excel(
+                ENCABEZADOS_CLIENTES, filas_clientes_direcciones(direcciones), titulo="Clientes y Direcciones"
+            )),
+            content_type=CONTENT_TYPE_XLSX,
+        )
     response['Content-Disposition'] = 'attachment; filename=clientes_direcciones.xlsx'
-    wb.save(response)
+    return response
+
+@login_required
+def exportar_cambios_excel(request):
+    """
+    Exporta a .xlsx solo los clientes creados, modificados o eliminados desde
+    ``?desde=`` (ver clientes/cambios.py). El nombre del archivo lleva la
+    marca desde la cual pedir la próxima exportación.
+    """
+    try:
+        desde, hasta = ventana(request.GET)
+    except ValueError:
+        messages.error(request, _("Indica una fecha válida desde la cual exportar los cambios."))
+        return redirect('consulta_clientes')
+
+    clientes = clientes_cambiados(request.perfil.clientes_visibles(), desde, hasta)
+    borrados = eliminados(request.perfil, desde, hasta)['clientes']
+    response = StreamingHttpResponse(
+        generar_excel(ENCABEZADOS_CAMBIOS, filas_cambios(clientes, borrados, desde), titulo="Cambios"),
+        content_type=CONTENT_TYPE_XLSX,
+    )
+    response['Content-Disposition'] = f'attachment; filename=clientes_cambios_{hasta:%Y%m%dT%H%M%S}.xlsx'
     return response
 
 #====================================
 # Vista para exportar a Pdf
 #====================================
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_usuario, last_modified_func=ultima_modificacion)
 def exportar_clientes_pdf(request):
-    clientes = Cliente.objects.prefetch_related('direcciones')
-    template = get_template('clientes/pdf_clientes.html')
-    html = template.render({'clientes': clientes})
+    """
+    Exporta a PDF las direcciones visibles para el usuario.
+    Los listados grandes se generan en segundo plano y se descargan desde
+    la página del trabajo; el PDF queda en disco mientras los datos no cambien.
+    """
+    direcciones = direcciones_visibles(request.perfil)
+    nombre = nombre_en_cache(f'clientes_direcciones_{alcance_exportacion(request.perfil)}', 'pdf')
+    ruta = archivo_cacheado(nombre)
+
+    if ruta is None:
+        if request.GET.get('segundo_plano') or direcciones.count() > PDF_FILAS_SINCRONICAS:
+            trabajo = encolar(Trabajo.EXPORTACION_PDF, usuario=request.user)
+            messages.success(request, _("El PDF se está generando en segundo plano."))
+            return redirect('detalle_trabajo', pk=trabajo.pk)
+
+        ruta = generar_en_cache(
+            nombre,
+            lambda destino: generar_pdf(destino, ENCABEZADOS_CLIENTES, filas_clientes_direcciones(direcciones)),
+        )
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename=clientes_direcciones.pdf'
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename='clientes_direcciones.pdf',
+                        content_type='application/pdf')
 
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse("Error al generar el PDF", status=500)
-    return response
+
+def _trabajo_visible(request, pk):
+    trabajo = get_object_or_404(Trabajo, pk=pk)
+    if trabajo.usuario_id != request.user.id and not request.perfil.es_supervisor:
+        return None
+    return trabajo
+
+
+@login_required
+def detalle_trabajo(request, pk):
+    trabajo = _trabajo_visible(request, pk)
+    if trabajo is None:
+        return HttpResponseForbidden("No tienes permiso para ver este trabajo.")
+    return render(request, 'clientes/trabajo.html', {'trabajo': trabajo})
+
+
+@login_required
+def descargar_trabajo(request, pk):
+    trabajo = _trabajo_visible(request, pk)
+    if trabajo is None:
+        return HttpResponseForbidden("No tienes permiso para descargar este archivo.")
+    if not trabajo.resultado:
+        raise Http404("El archivo aún no está disponible.")
+    return FileResponse(trabajo.resultado.open('rb'), as_attachment=True,
+                        filename=os.path.basename(trabajo.resultado.name))
 
 
 #=========================================
 # Vista para importar planilla de clientes
 #=========================================
+@csrf_exempt
 @login_required
 #@user_passes_test(es_supervisor)
 def importar_clientes(request):
     """
-    Vista para subir un Excel y crear clientes + direcciones.
-    Muestra errores inline y solo redirige tras éxito real.
+    Vista para subir un Excel y encolar la creación de clientes + direcciones.
+    Muestra errores inline y solo redirige tras encolar la importación.
     """
+    # El handler debe instalarse antes de que se lea el cuerpo de la petición,
+    # y el middleware CSRF lo lee: por eso el CSRF se valida en _importar_clientes
+    request.upload_handlers = [SubidaImportacionHandler(request)]
+    return _importar_clientes(request)
+
+
+@csrf_protect
+def _importar_clientes(request):
     if request.method == 'POST':
         form = ImportacionForm(request.POST, request.FILES)
 
-        # 1) ¿Llega archivo?
+        # 1) ¿Llega archivo? ¿Dentro del tamaño permitido?
         archivo = request.FILES.get('archivo')
-        if not archivo:
+        if getattr(request, 'subida_excedida', False) or (archivo and archivo.size > TAMANO_MAXIMO):
+            form.add_error('archivo', _("El archivo supera el tamaño máximo de %(mb)s MB.")
+                           % {'mb': TAMANO_MAXIMO // (1024 * 1024)})
+        elif not archivo:
             form.add_error('archivo', 'Debes seleccionar un archivo antes de importar.')
         # 2) ¿Extensión válida?
-        elif not archivo.name.lower().endswith(('.xlsx', '.xls')):
-            form.add_error('archivo', 'Formato no válido. Usa .xlsx o .xls.')
+        elif not archivo.name.lower().endswith(EXTENSIONES_PERMITIDAS):
+            form.add_error('archivo', 'Formato no válido. Usa .xlsx, .csv o .tsv.')
 
         # 3) Si el form está libre de errores de campo, seguimos con hash y duplicados
         if not form.errors:
-            # Leer contenido para hash
-            contenido = archivo.read()
-            hash_archivo = hashlib.sha256(contenido).hexdigest()
-
-            # Reinicia puntero para usar luego en openpyxl
-            archivo.seek(0)
-
-            # 4) ¿Ya existe ese hash?
-            if ImportacionLog.objects.filter(hash_archivo=hash_archivo).exists():
-                form.add_error(None, 'Este archivo ya fue importado anteriormente.')
-
-        # 5) Si tras todas las validaciones el form está OK → procesar y redirigir
+            # Calculado por bloques mientras se recibía el archivo (ver subidas.py)
+            hash_archivo = calcular_hash(archivo)
+
+            # 4) ¿Ya existe ese hash? Si esa importación quedó a medias, se retoma
+            anterior = ImportacionLog.objects.filter(hash_archivo=hash_archivo).first()
+            if anterior is not None:
+                if anterior.estado == ImportacionLog.TERMINADO:
+                    form.add_error(None, 'Este archivo ya fue importado anteriormente.')
+                elif _importacion_visible(request, anterior.pk) is None:
+                    form.add_error(None, 'Este archivo ya está siendo importado por otro usuario.')
+                else:
+                    return _reanudar(request, anterior)
+
+        # 5) Si tras todas las validaciones el form está OK → encolar y redirigir
         if form.is_valid():
             # Guardar log preliminar
             log = form.save(commit=False)
@@ -349,65 +488,14 @@ def importar_clientes(request):
             log.hash_archivo = hash_archivo
             log.save()
 
-            # Cargar el libro
-            wb = load_workbook(archivo, data_only=True)
-            sheet = wb.active
-            fila_inicio = 2
-
-            errores = []
-            exitosos = fallidos = 0
-
-            for idx, row in enumerate(sheet.iter_rows(min_row=fila_inicio), start=fila_inicio):
-                tipo, nombre, rut, email, telefono, web, obs_cli, \
-                  calle, numero, comuna, ciudad, cp, pais, obs_dir = (
-                    cell.value for cell in row
-                )
-
-                # Validaciones básicas
-                if not (nombre and rut and comuna and calle):
-                    fallidos += 1
-                    errores.append({'fila': idx, 'error': 'Faltan campos obligatorios'})
-                    continue
-
-                if Cliente.objects.filter(rut=rut).exists():
-                    fallidos += 1
-                    errores.append({'fila': idx, 'error': 'Cliente ya existe'})
-                    continue
-
-                # Crear Cliente + Dirección
-                cliente = Cliente.objects.create(
-                    tipo_entidad=tipo,
-                    nombre_razon_social=nombre,
-                    rut=rut,
-                    email=email,
-                    telefono=telefono,
-                    sitio_web=web,
-                    observacion=obs_cli
-                )
-                Direccion.objects.create(
-                    cliente=cliente,
-                    calle=calle,
-                    numero=numero,
-                    comuna=comuna,
-                    ciudad=ciudad,
-                    codigo_postal=cp,
-                    pais=pais,
-                    observacion=obs_dir
-                )
-                exitosos += 1
-
-            # Actualizar log con resultados
-            log.exitosos = exitosos
-            log.fallidos = fallidos
-            log.errores = json.dumps(errores, ensure_ascii=False, indent=2)
-            log.save()
+            # El procesamiento corre en segundo plano (manage.py procesar_trabajos)
+            encolar(Trabajo.IMPORTACION, importacion=log)
 
-            # Mensaje de éxito y redirect (Post/Redirect/Get)
             messages.success(
                 request,
-                f"Importación finalizada: {exitosos} clientes creados, {fallidos} errores."
+                _("Archivo recibido. La importación se está procesando en segundo plano.")
             )
-            return redirect('lista_clientes')  # Asume que tu vista de lista tiene este name
+            return redirect('detalle_importacion', pk=log.pk)
 
         # Si hay ANY error de form (campo o no-field), caemos aquí
         # Y volvemos a renderizar la vista con los errores inline
@@ -418,28 +506,138 @@ def importar_clientes(request):
     return render(request, 'clientes/importar_clientes.html', {'form': form})
 
 
+def _importacion_visible(request, pk):
+    log = get_object_or_404(ImportacionLog, pk=pk)
+    if log.usuario_id != request.user.id and not request.perfil.es_supervisor:
+        return None
+    return log
+
+
+def _reanudar(request, log):
+    if reanudar_importacion(log, usuario=request.user):
+        messages.success(
+            request,
+            _("La importación se retomará desde la fila %(fila)s.") % {'fila': max(log.ultima_fila + 1, 2)}
+        )
+    else:
+        messages.info(request, _("Esta importación ya se está procesando."))
+    return redirect('detalle_importacion', pk=log.pk)
+
+
+@login_required
+def reanudar_importacion_view(request, pk):
+    """Retoma una importación interrumpida desde su último punto de control."""
+    log = _importacion_visible(request, pk)
+    if log is None:
+        return HttpResponseForbidden("No tienes permiso para ver esta importación.")
+    if request.method != 'POST':
+        return redirect('detalle_importacion', pk=pk)
+    return _reanudar(request, log)
+
+
+@login_required
+def detalle_importacion(request, pk):
+    """
+    Página de avance de una importación. Mientras el trabajo corre, la
+    plantilla consulta `progreso_importacion`; al terminar muestra el resultado.
+    """
+    log = _importacion_visible(request, pk)
+    if log is None:
+        return HttpResponseForbidden("No tienes permiso para ver esta importación.")
+
+    context = {'form': ImportacionForm(), 'importacion': log}
+    if log.estado == ImportacionLog.TERMINADO:
+        context.update({
+            'exitosos': log.exitosos,
+            'fallidos': log.fallidos,
+            'errores': json.loads(log.errores or '[]'),
+        })
+        context['errores_omitidos'] = log.fallidos - len(context['errores'])
+        if request.perfil.es_supervisor:
+            context['candidatos'] = log.candidatos.count()
+    return render(request, 'clientes/importar_clientes.html', context)
+
+
+@login_required
+def duplicados_importacion(request):
+    """
+    Reporte para supervisores de los posibles duplicados detectados al
+    importar; ``?importacion=<pk>`` limita el reporte a una importación.
+    """
+    if not request.perfil.es_supervisor:
+        return HttpResponseForbidden("Solo los supervisores pueden ver este reporte.")
+
+    candidatos = CandidatoDuplicado.objects.select_related('cliente', 'similar', 'importacion')
+    importacion = None
+    if request.GET.get('importacion', '').isdigit():
+        importacion = get_object_or_404(ImportacionLog, pk=request.GET['importacion'])
+        candidatos = candidatos.filter(importacion=importacion)
+
+    pagina = paginar_keyset(candidatos, request.GET)
+    return render(request, 'clientes/duplicados.html', {
+        'candidatos': pagina,
+        'pagina': pagina,
+        'importacion': importacion,
+    })
+
+
+@login_required
+def progreso_importacion(request, pk):
+    """Estado de una importación en JSON, para consultarlo periódicamente."""
+    log = _importacion_visible(request, pk)
+    if log is None:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+
+    return JsonResponse({
+        'estado': log.estado,
+        'procesadas': log.procesadas,
+        'total': log.total_filas,
+        'porcentaje': log.porcentaje,
+        'exitosos': log.exitosos,
+        'fallidos': log.fallidos,
+    })
+
+
 ######################### Vista para el Dashboard #####################
 @login_required
 #@user_passes_test(es_supervisor)
 def dashboard_supervisor(request):
-    total_clientes = Cliente.objects.count()
-    sin_agente = Cliente.objects.filter(agente__isnull=True).count()
-    activos = Cliente.objects.filter(activo=True).count()
-    inactivos = Cliente.objects.filter(activo=False).count()
-    ultima_importacion = ImportacionLog.objects.order_by('-fecha').first()
-
-    agentes = AgenteVentas.objects.all()
-    clientes_por_agente = {
-        agente.nombre: Cliente.objects.filter(agente=agente).count()
-        for agente in agentes
-    }
-
-    context = {
-        'total_clientes': total_clientes,
-        'sin_agente': sin_agente,
-        'activos': activos,
-        'inactivos': inactivos,
-        'ultima_importacion': ultima_importacion,
-        'clientes_por_agente': clientes_por_agente,
-    }
+    # Totales, conteo por agente y última importación en tres consultas, servidos desde la caché
+    context = obtener_estadisticas()
     return render(request, 'clientes/dashboard.html', context)
+
+
+@login_required
+def rendimiento_vistas(request):
+    """Percentiles de tiempo por vista medidos por InstrumentacionMiddleware."""
+    if not request.perfil.es_supervisor:
+        return HttpResponseForbidden("Solo los supervisores pueden ver el rendimiento.")
+    return render(request, 'clientes/rendimiento.html', {
+        'vistas': resumen_por_vista(),
+        'activa': getattr(settings, 'INSTRUMENTACION_ACTIVA', False),
+    })
+
+
+@login_required
+@require_POST
+def acciones_masivas(request):
+    """
+    Reasigna agente, activa/desactiva o cambia el tipo de entidad de varios
+    clientes con un solo UPDATE (ver clientes/acciones.py).
+    """
+    if not request.perfil.es_supervisor:
+        return HttpResponseForbidden("Solo los supervisores pueden aplicar acciones masivas.")
+
+    form = AccionMasivaForm(request.POST)
+    if form.is_valid():
+        total = aplicar_accion(form.clientes(), **form.parametros())
+        messages.success(request, _("%(total)d clientes actualizados.") % {'total': total})
+    else:
+        errores = [error for lista in form.errors.values() for error in lista]
+        messages.error(request, errores[0])
+
+    volver = request.POST.get('volver', '')
+    if not url_has_allowed_host_and_scheme(volver, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        volver = reverse('lista_clientes')
+    return redirect(volver)
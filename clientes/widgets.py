@@ -0,0 +1,53 @@
+"""
+Widgets de formulario.
+
+``SelectAutocompletar`` reemplaza a ``forms.Select`` en campos
+``ModelChoiceField`` sobre tablas que pueden crecer: el HTML solo lleva la
+opción elegida y ``js/autocompletar.js`` pide las demás, por páginas, al
+endpoint de ``autocompletar.py`` mientras el usuario escribe.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
+
+
+class SelectAutocompletar(forms.Select):
+
+    def __init__(self, fuente, attrs=None):
+        super().__init__(attrs)
+        self.fuente = fuente
+
+    class Media:
+        js = ['js/autocompletar.js']
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs.setdefault('class', 'form-select')
+        attrs['data-autocompletar'] = reverse('autocompletar', args=[self.fuente])
+        attrs['data-buscar'] = _("Buscar...")
+        attrs['data-mas'] = _("Más resultados...")
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """Solo la opción vacía y la elegida (como ``AutocompleteSelect`` del admin)."""
+        opciones = []
+        campo = self.choices.field
+        elegidos = set()
+        for valor in value:
+            if str(valor) in campo.empty_values:
+                continue
+            # Un valor enviado que no es una pk válida deja el select vacío, como forms.Select
+            try:
+                campo.queryset.model._meta.pk.to_python(valor)
+            except ValidationError:
+                continue
+            elegidos.add(str(valor))
+        if campo.empty_label is not None or not elegidos:
+            opciones.append(self.create_option(name, '', campo.empty_label or '', not elegidos, 0))
+        if elegidos:
+            for objeto in self.choices.queryset.filter(pk__in=elegidos):
+                opciones.append(self.create_option(
+                    name, campo.prepare_value(objeto), campo.label_from_instance(objeto), True, len(opciones),
+                ))
+        return [(None, opciones, 0)]
@@ -0,0 +1,91 @@
+"""
+Perfiles de base de datos, elegidos con la variable de entorno ``DB_PERFIL``.
+
+``sqlite`` (por defecto)
+    Archivo local con journal WAL: los lectores no se bloquean mientras una
+    importación escribe, y la espera ante un bloqueo la fija ``busy_timeout``
+    en vez de fallar de inmediato. Los PRAGMA se aplican en cada conexión
+    nueva (señal ``connection_created``); ``DB_SQLITE_PRAGMAS=0`` los desactiva.
+
+``postgres``
+    ``DB_NOMBRE``, ``DB_USUARIO``, ``DB_CLAVE``, ``DB_HOST`` y ``DB_PUERTO``.
+    Django 4.1 no trae pool propio: cada proceso reutiliza su conexión
+    (``CONN_MAX_AGE`` con ``CONN_HEALTH_CHECKS``) y, para compartir un pool
+    entre procesos, ``DB_HOST`` puede apuntar a PgBouncer en modo
+    transacción con ``DB_PGBOUNCER=1``.
+
+En ambos, ``DB_CONN_MAX_AGE`` son los segundos que se mantiene abierta una
+conexión entre peticiones (0 = una por petición, como antes).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+
+# PRAGMA -> valor. mmap y cache_size en bytes/KiB (cache_size negativo = KiB)
+PRAGMAS_SQLITE = {
+    'journal_mode': 'WAL',
+    # Con WAL, NORMAL no arriesga corrupción; solo la última transacción ante un corte de luz
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def _entorno(nombre, defecto=None):
+    return os.environ.get(nombre, defecto)
+
+
+def configuracion(base_dir):
+    """Entrada ``default`` de ``DATABASES`` según ``DB_PERFIL``."""
+    perfil = _entorno('DB_PERFIL', 'sqlite')
+    conn_max_age = int(_entorno('DB_CONN_MAX_AGE', 60))
+
+    if perfil == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': _entorno('DB_NOMBRE', base_dir / 'db.sqlite3'),
+            'CONN_MAX_AGE': conn_max_age,
+            'PRAGMAS': PRAGMAS_SQLITE if _entorno('DB_SQLITE_PRAGMAS', '1') == '1' else {},
+        }
+
+    if perfil == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': _entorno('DB_NOMBRE', 'gestion_clientes'),
+            'USER': _entorno('DB_USUARIO', ''),
+            'PASSWORD': _entorno('DB_CLAVE', ''),
+            'HOST': _entorno('DB_HOST', ''),
+            'PORT': _entorno('DB_PUERTO', ''),
+            'CONN_MAX_AGE': conn_max_age,
+            # Descarta conexiones reutilizadas que el servidor (o PgBouncer) cerró
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer en modo transacción no conserva cursores con nombre entre transacciones
+            'DISABLE_SERVER_SIDE_CURSORS': _entorno('DB_PGBOUNCER', '0') == '1',
+            'OPTIONS': {'connect_timeout': int(_entorno('DB_CONNECT_TIMEOUT', 5))},
+        }
+
+    raise ImproperlyConfigured(f"DB_PERFIL desconocido: {perfil!r} (use 'sqlite' o 'postgres')")
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Directo sobre la conexión sqlite3: no cuenta como consulta de la petición
+    for nombre, valor in (connection.settings_dict.get('PRAGMAS') or {}).items():
+        connection.connection.execute(f'PRAGMA {nombre} = {valor}')
+
+
+connection_created.connect(aplicar_pragmas, dispatch_uid='gestion_clientes.base_datos.aplicar_pragmas')
+
+
+def modo_journal(connection):
+    """``journal_mode`` efectivo de una conexión SQLite (``None`` en otros motores)."""
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
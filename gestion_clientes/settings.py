@@ -14,6 +14,8 @@ import os
 from django.utils.translation import gettext_lazy as _
 from pathlib import Path
 
+from . import base_datos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,11 +45,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'clientes.middleware.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'clientes.middleware.PerfilUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -77,14 +81,49 @@ WSGI_APPLICATION = 'gestion_clientes.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Perfil elegido con DB_PERFIL (sqlite por defecto, o postgres); ver gestion_clientes/base_datos.py
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': base_datos.configuracion(BASE_DIR),
 }
 
 
+# Caché
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Compartida entre los procesos web y el worker de trabajos, para que la
+# invalidación llegue a todos (la caché en memoria es propia de cada proceso).
+# Guarda filas de la lista por agente y página, estadísticas, perfiles,
+# generaciones y credenciales de la API.
+#
+# Por defecto, en archivos. Al pasar de MAX_ENTRIES borra al azar un tercio de
+# las entradas, y cada set() lista el directorio completo: con miles de
+# entradas esto cuesta varios ms por escritura. CACHE_MAX_ENTRIES debe cubrir
+# agentes activos x páginas visitadas. Con muchos agentes conviene Redis
+# (CACHE_REDIS_URL, requiere el paquete redis), que no tiene ninguno de los
+# dos problemas.
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+        }
+    }
+
+# Segundos que se reutilizan las estadísticas del dashboard (además de invalidarse por señales)
+ESTADISTICAS_CACHE_TTL = 60
+# Segundos que se reutiliza el rol/agente de cada usuario (request.perfil)
+PERFIL_CACHE_TTL = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -128,6 +167,10 @@ LOCALE_PATHS = [os.path.join(BASE_DIR, 'locale')]  # carpeta donde se guardarán
 
 STATIC_URL = '/static/'
 
+# Archivos subidos (planillas de importación en BASE_DIR / 'importaciones').
+# Ruta absoluta para que el worker de trabajos los encuentre desde cualquier directorio.
+MEDIA_ROOT = BASE_DIR
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -136,3 +179,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/'                    # ruta del formulario de login
 LOGIN_REDIRECT_URL = '/clientes/'  # tras login exitoso
 LOGOUT_REDIRECT_URL = '/'          # tras logout
+
+# Exportaciones: filas leídas por bloque y filas usadas para calcular anchos de columna
+EXPORTACION_TAMANO_BLOQUE = 2000
+EXPORTACION_MUESTRA_ANCHOS = 500
+
+# Importación de planillas: filas por lote (una transacción por lote)
+IMPORTACION_TAMANO_LOTE = 1000
+IMPORTACION_TIPO_DIRECCION = 'Principal'
+# Validación en paralelo de planillas desde IMPORTACION_FILAS_PARALELO filas. Opcional:
+# la validación es ~7% del tiempo de una importación (domina el escritor único), así
+# que el pool rara vez compensa enviar cada lote a otro proceso
+IMPORTACION_PROCESOS = int(os.environ.get('IMPORTACION_PROCESOS', 1))
+IMPORTACION_FILAS_PARALELO = 20000
+# Errores por fila guardados en el log de cada importación (los demás solo se cuentan)
+IMPORTACION_MAX_ERRORES = 1000
+# Tamaño máximo de una planilla subida (bytes); se recibe siempre a un archivo temporal
+IMPORTACION_TAMANO_MAXIMO = 50 * 1024 * 1024
+
+# Listados paginados por cursor: tamaño por defecto y máximo permitido en ?por_pagina=
+CLIENTES_POR_PAGINA = 50
+CLIENTES_POR_PAGINA_MAXIMO = 200
+
+# Exportación a PDF: sobre este número de filas se genera como trabajo en segundo plano
+PDF_FILAS_SINCRONICAS = 5000
+
+# Exportaciones ya generadas, reutilizadas mientras no cambie la versión de los datos
+EXPORTACION_CACHE_DIR = BASE_DIR / 'exportaciones' / 'cache'
+
+# Segundos que se guardan las filas renderizadas de la lista de clientes (además de invalidarse por señales)
+LISTA_CACHE_TTL = 600
+
+# Instrumentación por petición (Server-Timing, log de peticiones lentas y percentiles por vista)
+INSTRUMENTACION_ACTIVA = os.environ.get('INSTRUMENTACION', '') == '1'
+INSTRUMENTACION_UMBRAL_MS = 500
+INSTRUMENTACION_UMBRAL_CONSULTAS = 50
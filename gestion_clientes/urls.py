@@ -16,6 +16,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from clientes import views as clientes_views
+from clientes import api as clientes_api
 
 from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
@@ -34,6 +35,13 @@ urlpatterns += [
     path('set_language/', set_language, name='set_language'),
 ]
 
+# API JSON de solo lectura (sin prefijo de idioma, para integraciones)
+urlpatterns += [
+    path('api/clientes/', clientes_api.clientes, name='api_clientes'),
+    path('api/clientes/<int:pk>/', clientes_api.cliente, name='api_cliente'),
+    path('api/cambios/', clientes_api.cambios, name='api_cambios'),
+]
+
 urlpatterns += i18n_patterns(
     path('admin/', admin.site.urls),
     path('', include('clientes.urls')),